@@ -1,29 +1,63 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from datetime import datetime, timedelta
-import uuid
+import calendar as cal
+from collections import Counter
+from datetime import datetime, timedelta, time as dt_time
+from functools import lru_cache
+from operator import attrgetter
+import asyncio
+import heapq
 import json
-import uuid
-import webbrowser
+import orjson
+import secrets
 import time
 try:
-    from oauth_handler import start_oauth_server, get_oauth_result, clear_oauth_result
+    from oauth_handler import start_oauth_server, register_oauth_state, wait_for_oauth_result, clear_oauth_result
     OAUTH_AVAILABLE = True
 except ImportError:
     OAUTH_AVAILABLE = False
 
+from config.settings import DEFAULT_POSTING_TIMES
+
 # Import services
 from services.database_service import DatabaseService
 from services.cache_service import CacheService
 from services.ai_service import AIService
 from services.linkedin_service import LinkedInService
 
+# Import utilities
+from utils.text import preview
+
 # Import models
 from models.user import UserProfile, ContentStrategy
 from models.content import LinkedInPost, PostType, PostStatus, ContentCalendar
 
+# Upper bound on points sent to a single time-series chart
+MAX_CHART_POINTS = 2000
+
+MONTH_NAMES = tuple(cal.month_name)[1:]
+
+# Parsed once; used when a user's preferred posting time is missing or invalid
+DEFAULT_SLOT_TIMES = tuple(dt_time.fromisoformat(t) for t in DEFAULT_POSTING_TIMES)
+
+# Post fields the analytics page reads, including those sent for AI analysis
+ANALYTICS_POST_FIELDS = (
+    'post_id', 'user_id', 'content', 'hashtags', 'post_type', 'created_at', 'engagement_rate',
+    'likes_count', 'comments_count', 'shares_count', 'views_count'
+)
+
+# Seconds between LinkedIn connection checks within a session
+LINKEDIN_CHECK_TTL = 600
+
+# Selectbox options shared by registration and profile forms
+INDUSTRIES = (
+    "Technology", "Healthcare", "Finance", "Education", "Marketing",
+    "Sales", "Consulting", "Manufacturing", "Real Estate", "Other"
+)
+BRAND_VOICES = ("professional", "casual", "authoritative", "friendly")
+POST_LENGTH_CHOICES = ("Short (< 300 chars)", "Medium (300-800 chars)", "Long (800+ chars)")
+_INDUSTRY_INDEX = {industry: i for i, industry in enumerate(INDUSTRIES)}
+_BRAND_VOICE_INDEX = {voice: i for i, voice in enumerate(BRAND_VOICES)}
+
 # Page config
 st.set_page_config(
     page_title="LinkedIn AI Agent",
@@ -35,15 +69,97 @@ st.set_page_config(
 # Initialize services
 @st.cache_resource
 def init_services():
+    cache = CacheService()
     return {
         'db': DatabaseService(),
-        'cache': CacheService(),
-        'ai': AIService(),
+        'cache': cache,
+        'ai': AIService(cache),
         'linkedin': LinkedInService()
     }
 
 services = init_services()
 
+@st.cache_resource
+def init_chart_template():
+    """Register the shared Plotly template once per process"""
+    import plotly.graph_objects as go
+    import plotly.io as pio
+    
+    pio.templates['linkedin'] = go.layout.Template(layout={
+        'colorway': ['#0077B5', '#00A0DC', '#8D6CAB', '#DD5143', '#E68523'],
+        'margin': {'t': 50, 'l': 10, 'r': 10, 'b': 10},
+        'hovermode': 'x unified'
+    })
+    pio.templates.default = 'plotly+linkedin'
+    return pio.templates['linkedin']
+
+# Cached reads. The version token is bumped whenever this session writes,
+# so the cache is only bypassed after a save/publish/schedule.
+@st.cache_data(ttl=60, show_spinner=False)
+def _cached_user_posts(user_id: str, version: int, limit: int = 100, fields: tuple = None) -> list:
+    return services['db'].get_user_posts(user_id, limit=limit, fields=fields)
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _cached_dashboard(user_id: str, posts_version: int):
+    return services['db'].get_user_dashboard(user_id, post_limit=5, series_limit=100)
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _cached_scheduled_posts(user_id: str, version: int,
+                            start: datetime = None, end: datetime = None) -> list:
+    return services['db'].get_scheduled_posts(user_id, start, end)
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _cached_content_strategy(user_id: str, version: int):
+    return services['db'].get_content_strategy(user_id)
+
+@st.cache_data(ttl=600, show_spinner="Generating content ideas...")
+def _cached_content_ideas(user_id: str, version: int, _user: UserProfile) -> list:
+    # Only falls through to Redis (and then Gemini) when the in-memory copy is missing
+    ideas = services['cache'].get_content_ideas(user_id)
+    if not ideas:
+        # A bumped version means the user asked for fresh ideas
+        ideas = services['ai'].generate_content_ideas(_user, count=20, use_cache=not version)
+        services['cache'].cache_content_ideas(user_id, ideas)
+    return ideas
+
+def _linkedin_profile(user_id: str, access_token: str):
+    """LinkedIn profile for the user, served from Redis when possible"""
+    profile = services['cache'].get_linkedin_profile(user_id)
+    if profile is None:
+        profile = services['linkedin'].get_user_profile(access_token)
+        if profile:
+            services['cache'].cache_linkedin_profile(user_id, profile)
+    return profile
+
+async def _save_linkedin_connection(user_id: str, access_token: str, refresh_token: str, profile: dict) -> bool:
+    """Persist the new tokens and cache the verified profile concurrently"""
+    update_success, _ = await asyncio.gather(
+        asyncio.to_thread(services['db'].update_user, user_id, {
+            "linkedin_access_token": access_token,
+            "linkedin_refresh_token": refresh_token
+        }),
+        asyncio.to_thread(services['cache'].cache_linkedin_profile, user_id, profile)
+    )
+    return update_success
+
+def _reset_linkedin_check(user_id: str):
+    """Forget the cached profile and connection check so the next render re-checks"""
+    services['cache'].delete(f"profile:{user_id}")
+    for key in ('linkedin_conn_checked_at', 'linkedin_conn_valid', 'linkedin_profile'):
+        st.session_state.pop(key, None)
+
+def _bump_version(key: str):
+    st.session_state[key] = st.session_state.get(key, 0) + 1
+
+@lru_cache(maxsize=64)
+def _month_grid(year: int, month: int) -> list:
+    """Week rows for a month; the layout never changes so it is memoized"""
+    return cal.monthcalendar(year, month)
+
+def _new_id() -> str:
+    """Generate an opaque unique identifier for users and posts"""
+    return secrets.token_hex(16)
+
 # Session state initialization
 if 'user_id' not in st.session_state:
     st.session_state.user_id = None
@@ -106,18 +222,13 @@ def login_page():
             with col1:
                 first_name = st.text_input("First Name")
                 email = st.text_input("Email")
-                industry = st.selectbox("Industry", [
-                    "Technology", "Healthcare", "Finance", "Education", "Marketing",
-                    "Sales", "Consulting", "Manufacturing", "Real Estate", "Other"
-                ])
+                industry = st.selectbox("Industry", INDUSTRIES)
                 company = st.text_input("Company")
             
             with col2:
                 last_name = st.text_input("Last Name")
                 job_title = st.text_input("Job Title")
-                brand_voice = st.selectbox("Brand Voice", [
-                    "professional", "casual", "authoritative", "friendly"
-                ])
+                brand_voice = st.selectbox("Brand Voice", BRAND_VOICES)
                 target_audience = st.text_input("Target Audience")
             
             skills = st.text_area("Skills (comma-separated)").split(",")
@@ -126,7 +237,7 @@ def login_page():
             
             if st.form_submit_button("Register"):
                 if first_name and last_name and email and industry and job_title:
-                    user_id = str(uuid.uuid4())
+                    user_id = _new_id()
                     user_profile = UserProfile(
                         user_id=user_id,
                         email=email,
@@ -153,6 +264,11 @@ def login_page():
 
 # Dashboard page
 def dashboard_page():
+    # pandas/plotly are imported lazily so pages that don't chart skip the cost
+    import pandas as pd
+    import plotly.graph_objects as go
+    init_chart_template()
+    
     st.title("📊 Dashboard")
     
     user = st.session_state.current_user
@@ -160,30 +276,33 @@ def dashboard_page():
     # Key metrics
     col1, col2, col3, col4 = st.columns(4)
     
-    user_posts = services['db'].get_user_posts(user.user_id, limit=100)
-    total_posts = len(user_posts)
+    # Metrics, recent posts and the engagement series come back from one aggregation
+    dashboard = _cached_dashboard(user.user_id, st.session_state.get('posts_version', 0))
+    if dashboard is None:
+        st.error("Could not load dashboard data. Please try again.")
+        return
+    stats = dashboard['stats']
+    user_posts = dashboard['recent_posts']
     
     with col1:
-        st.metric("Total Posts", total_posts)
+        st.metric("Total Posts", stats['total_posts'])
     
     with col2:
-        avg_engagement = sum(post.engagement_rate for post in user_posts) / max(total_posts, 1)
+        avg_engagement = stats['avg_engagement'] or 0.0
         st.metric("Avg Engagement Rate", f"{avg_engagement:.1f}%")
     
     with col3:
-        scheduled_posts = services['db'].get_scheduled_posts(user.user_id)
-        st.metric("Scheduled Posts", len(scheduled_posts))
+        st.metric("Scheduled Posts", dashboard['scheduled_count'])
     
     with col4:
-        total_likes = sum(post.likes_count for post in user_posts)
-        st.metric("Total Likes", total_likes)
+        st.metric("Total Likes", stats['total_likes'])
     
     # Recent activity
     st.subheader("Recent Posts")
     if user_posts:
-        for post in user_posts[:5]:
+        for post in user_posts:
             with st.expander(f"Post from {post.created_at.strftime('%Y-%m-%d')} - {post.status}"):
-                st.write(post.content[:200] + "..." if len(post.content) > 200 else post.content)
+                st.write(preview(post.content))
                 
                 col1, col2, col3 = st.columns(3)
                 col1.metric("Likes", post.likes_count)
@@ -193,17 +312,12 @@ def dashboard_page():
         st.info("No posts yet. Start creating content in the Content Generator!")
     
     # Engagement chart
-    if user_posts:
+    series = dashboard['engagement_series']
+    if series:
         st.subheader("Engagement Over Time")
-        df = pd.DataFrame([{
-            'date': post.created_at,
-            'engagement_rate': post.engagement_rate,
-            'likes': post.likes_count,
-            'comments': post.comments_count,
-            'shares': post.shares_count
-        } for post in user_posts])
-        
-        fig = px.line(df, x='date', y='engagement_rate', title='Engagement Rate Over Time')
+        df = pd.DataFrame(series, columns=['created_at', 'engagement_rate'])
+        fig = go.Figure(go.Scattergl(x=df['created_at'], y=df['engagement_rate'], mode='lines'))
+        fig.update_layout(title='Engagement Rate Over Time')
         st.plotly_chart(fig, use_container_width=True)
 
 # Profile setup page
@@ -218,17 +332,12 @@ def profile_page():
         with col1:
             full_name = st.text_input("Full Name", value=user.full_name)
             email = st.text_input("Email", value=user.email)
-            industry = st.selectbox("Industry", [
-                "Technology", "Healthcare", "Finance", "Education", "Marketing",
-                "Sales", "Consulting", "Manufacturing", "Real Estate", "Other"
-            ], index=0 if user.industry == "Technology" else 0)
+            industry = st.selectbox("Industry", INDUSTRIES, index=_INDUSTRY_INDEX.get(user.industry, 0))
             job_title = st.text_input("Job Title", value=user.job_title)
             company = st.text_input("Company", value=user.company)
         
         with col2:
-            brand_voice = st.selectbox("Brand Voice", [
-                "professional", "casual", "authoritative", "friendly"
-            ], index=["professional", "casual", "authoritative", "friendly"].index(user.brand_voice))
+            brand_voice = st.selectbox("Brand Voice", BRAND_VOICES, index=_BRAND_VOICE_INDEX.get(user.brand_voice, 0))
             
             target_audience = st.text_input("Target Audience", value=user.target_audience)
             posting_frequency = st.number_input("Posts per Week", min_value=1, max_value=7, value=user.posting_frequency)
@@ -265,12 +374,15 @@ def profile_page():
 
 # Content strategy page
 def strategy_page():
+    import plotly.express as px
+    init_chart_template()
+    
     st.title("🎯 Content Strategy")
     
     user = st.session_state.current_user
     
     # Check if strategy exists
-    strategy = services['db'].get_content_strategy(user.user_id)
+    strategy = _cached_content_strategy(user.user_id, st.session_state.get('strategy_version', 0))
     
     if not strategy:
         st.info("No content strategy found. Let's create one!")
@@ -278,7 +390,10 @@ def strategy_page():
         if st.button("Generate AI-Powered Content Strategy"):
             with st.spinner("Generating your personalized content strategy..."):
                 try:
-                    strategy_data = services['ai'].generate_content_strategy(user)
+                    # Content ideas are generated alongside the strategy
+                    bundle = asyncio.run(services['ai'].generate_user_bundle(user, idea_count=20))
+                    strategy_data = bundle['strategy']
+                    services['cache'].cache_content_ideas(user.user_id, bundle['ideas'])
                     
                     strategy = ContentStrategy(
                         user_id=user.user_id,
@@ -289,6 +404,7 @@ def strategy_page():
                     )
                     
                     services['db'].save_content_strategy(strategy)
+                    _bump_version('strategy_version')
                     st.success("Content strategy generated successfully!")
                     st.rerun()
                 except Exception as e:
@@ -300,13 +416,15 @@ def strategy_page():
         # Content pillars
         st.subheader("📋 Content Pillars")
         col1, col2 = st.columns(2)
+        pillars = strategy.content_pillars
+        half = len(pillars) // 2
         
         with col1:
-            for i, pillar in enumerate(strategy.content_pillars[:len(strategy.content_pillars)//2]):
+            for pillar in pillars[:half]:
                 st.info(f"🎯 {pillar}")
         
         with col2:
-            for i, pillar in enumerate(strategy.content_pillars[len(strategy.content_pillars)//2:]):
+            for pillar in pillars[half:]:
                 st.info(f"🎯 {pillar}")
         
         # Hashtag strategy
@@ -335,92 +453,22 @@ def strategy_page():
         if st.button("Regenerate Strategy"):
             with st.spinner("Regenerating strategy..."):
                 try:
-                    strategy_data = services['ai'].generate_content_strategy(user)
+                    strategy_data = services['ai'].generate_content_strategy(user, use_cache=False)
                     strategy.content_pillars = strategy_data.get('content_pillars', [])
                     strategy.hashtag_strategy = strategy_data.get('hashtag_strategy', [])
                     strategy.trending_topics = strategy_data.get('trending_topics', [])
                     strategy.content_mix = strategy_data.get('content_mix', {})
                     
                     services['db'].save_content_strategy(strategy)
+                    _bump_version('strategy_version')
                     st.success("Strategy updated!")
                     st.rerun()
                 except Exception as e:
                     st.error(f"Error updating strategy: {e}")
 
-# Content generator page
-def generator_page():
-    st.title("✍️ Content Generator")
-    
-    user = st.session_state.current_user
-    strategy = services['db'].get_content_strategy(user.user_id)
-    
-    if not strategy:
-        st.warning("Please create a content strategy first!")
-        if st.button("Go to Strategy Page"):
-            st.session_state.page = "strategy"
-            st.rerun()
-        return
-    
-    # Content generation form
-    st.subheader("Generate New Content")
-    
-    col1, col2 = st.columns([2, 1])
-    
-    with col1:
-        # Content ideas from cache or generate new
-        cached_ideas = services['cache'].get_content_ideas(user.user_id)
-        if not cached_ideas:
-            with st.spinner("Generating content ideas..."):
-                cached_ideas = services['ai'].generate_content_ideas(user, count=20)
-                services['cache'].cache_content_ideas(user.user_id, cached_ideas)
-        
-        topic = st.selectbox("Select Topic", ["Custom Topic"] + cached_ideas)
-        
-        if topic == "Custom Topic":
-            topic = st.text_input("Enter your custom topic")
-        
-        post_type = st.selectbox("Post Type", ["text", "article", "carousel", "poll"])
-        
-        if st.button("Generate Content", type="primary"):
-            if topic and topic != "Custom Topic":
-                with st.spinner("Generating your LinkedIn post..."):
-                    try:
-                        content_data = services['ai'].generate_linkedin_post(
-                            user, strategy, topic, PostType(post_type)
-                        )
-                        
-                        # Create post object
-                        post = LinkedInPost(
-                            post_id=str(uuid.uuid4()),
-                            user_id=user.user_id,
-                            content=content_data.get('content', ''),
-                            post_type=PostType(post_type),
-                            hashtags=content_data.get('hashtags', []),
-                            generated_from_topic=topic,
-                            ai_confidence_score=content_data.get('confidence_score', 0.0),
-                            status=PostStatus.DRAFT
-                        )
-                        
-                        # Save to session state for preview
-                        st.session_state.generated_post = post
-                        st.success("Content generated successfully!")
-                        
-                    except Exception as e:
-                        st.error(f"Error generating content: {e}")
-            else:
-                st.error("Please select or enter a topic.")
-    
-    with col2:
-        st.subheader("Quick Actions")
-        if st.button("🔄 Refresh Ideas"):
-            # Clear cache and regenerate
-            services['cache'].delete(f"content_ideas:{user.user_id}")
-            st.rerun()
-        
-        if st.button("📈 Get Trending Topics"):
-            # This would integrate with real trend analysis
-            st.info("Feature coming soon!")
-    
+# Generated post preview and scheduling
+@st.fragment
+def generated_post_fragment(user):
     # Preview generated content
     if 'generated_post' in st.session_state:
         st.subheader("Generated Content Preview")
@@ -444,6 +492,7 @@ def generator_page():
             with col1:
                 if st.button("💾 Save as Draft"):
                     if services['db'].save_post(post):
+                        _bump_version('posts_version')
                         st.success("Saved as draft!")
                         del st.session_state.generated_post
                     else:
@@ -472,6 +521,7 @@ def generator_page():
                                 post.linkedin_post_id = post_id
                                 
                                 if services['db'].save_post(post):
+                                    _bump_version('posts_version')
                                     st.success(f"✅ Post published successfully to LinkedIn!")
                                     st.info(f"LinkedIn Post ID: {post_id}")
                                     del st.session_state.generated_post
@@ -485,6 +535,7 @@ def generator_page():
             with col4:
                 if st.button("✨ Regenerate"):
                     del st.session_state.generated_post
+                    st.session_state.skip_post_cache = True
                     st.rerun()
     
     # Scheduling interface
@@ -503,6 +554,7 @@ def generator_page():
             post.status = PostStatus.SCHEDULED
             
             if services['db'].save_post(post):
+                _bump_version('posts_version')
                 st.success(f"Post scheduled for {post.scheduled_time}")
                 del st.session_state.scheduling_post
                 if 'generated_post' in st.session_state:
@@ -510,6 +562,81 @@ def generator_page():
             else:
                 st.error("Failed to schedule post.")
 
+# Content generator page
+def generator_page():
+    st.title("✍️ Content Generator")
+    
+    user = st.session_state.current_user
+    strategy = _cached_content_strategy(user.user_id, st.session_state.get('strategy_version', 0))
+    
+    if not strategy:
+        st.warning("Please create a content strategy first!")
+        if st.button("Go to Strategy Page"):
+            st.session_state.page = "strategy"
+            st.rerun()
+        return
+    
+    # Content generation form
+    st.subheader("Generate New Content")
+    
+    col1, col2 = st.columns([2, 1])
+    
+    with col1:
+        # Content ideas from cache or generate new
+        cached_ideas = _cached_content_ideas(user.user_id, st.session_state.get('ideas_version', 0), user)
+        
+        topic = st.selectbox("Select Topic", ["Custom Topic"] + cached_ideas)
+        
+        if topic == "Custom Topic":
+            topic = st.text_input("Enter your custom topic")
+        
+        post_type = st.selectbox("Post Type", ["text", "article", "carousel", "poll"])
+        
+        if st.button("Generate Content", type="primary"):
+            if topic and topic != "Custom Topic":
+                with st.spinner("Generating your LinkedIn post..."):
+                    try:
+                        content_data = services['ai'].generate_linkedin_post(
+                            user, strategy, topic, PostType(post_type),
+                            use_cache=not st.session_state.pop('skip_post_cache', False)
+                        )
+                        
+                        # Create post object
+                        post = LinkedInPost(
+                            post_id=_new_id(),
+                            user_id=user.user_id,
+                            content=content_data.get('content', ''),
+                            post_type=PostType(post_type),
+                            hashtags=content_data.get('hashtags', []),
+                            generated_from_topic=topic,
+                            ai_confidence_score=content_data.get('confidence_score', 0.0),
+                            status=PostStatus.DRAFT
+                        )
+                        
+                        # Save to session state for preview
+                        st.session_state.generated_post = post
+                        st.success("Content generated successfully!")
+                        
+                    except Exception as e:
+                        st.error(f"Error generating content: {e}")
+            else:
+                st.error("Please select or enter a topic.")
+    
+    with col2:
+        st.subheader("Quick Actions")
+        if st.button("🔄 Refresh Ideas"):
+            # Clear cache and regenerate
+            services['cache'].delete(f"content_ideas:{user.user_id}")
+            _bump_version('ideas_version')
+            st.rerun()
+        
+        if st.button("📈 Get Trending Topics"):
+            # This would integrate with real trend analysis
+            st.info("Feature coming soon!")
+    
+    # Preview and scheduling rerun on their own when their buttons are clicked
+    generated_post_fragment(user)
+
 # Content calendar page
 def calendar_page():
     st.title("📅 Content Calendar")
@@ -517,35 +644,30 @@ def calendar_page():
     user = st.session_state.current_user
     
     # Month selection
+    now = datetime.now()
     col1, col2 = st.columns(2)
     with col1:
         selected_month = st.selectbox("Month", range(1, 13), 
-                                    index=datetime.now().month - 1,
-                                    format_func=lambda x: datetime(2023, x, 1).strftime('%B'))
+                                    index=now.month - 1,
+                                    format_func=lambda x: MONTH_NAMES[x - 1])
     with col2:
         selected_year = st.selectbox("Year", range(2023, 2026), 
-                                   index=datetime.now().year - 2023)
+                                   index=now.year - 2023)
     
     # Get calendar data
     calendar_data = services['db'].get_calendar(user.user_id, selected_month, selected_year)
-    scheduled_posts = services['db'].get_scheduled_posts(user.user_id)
     
-    # Filter posts for selected month
-    month_posts = [
-        post for post in scheduled_posts 
-        if post.scheduled_time and 
-        post.scheduled_time.month == selected_month and 
-        post.scheduled_time.year == selected_year
-    ]
+    # Only fetch posts scheduled within the selected month
+    month_start = datetime(selected_year, selected_month, 1)
+    month_end = datetime(selected_year + selected_month // 12, selected_month % 12 + 1, 1)
+    month_posts = _cached_scheduled_posts(user.user_id, st.session_state.get('posts_version', 0),
+                                          month_start, month_end)
     
     # Calendar visualization
     st.subheader(f"Calendar for {datetime(selected_year, selected_month, 1).strftime('%B %Y')}")
     
-    # Create calendar grid
-    import calendar as cal
-    
-    # Get calendar for the month
-    month_calendar = cal.monthcalendar(selected_year, selected_month)
+    # Get calendar grid for the month
+    month_calendar = _month_grid(selected_year, selected_month)
     weekdays = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
     
     # Display calendar
@@ -553,20 +675,19 @@ def calendar_page():
     for i, day in enumerate(weekdays):
         cols[i].write(f"**{day}**")
     
+    # Count posts per day in a single pass
+    posts_per_day = Counter(post.scheduled_time.day for post in month_posts)
+    
     for week in month_calendar:
         cols = st.columns(7)
         for i, day in enumerate(week):
             if day == 0:
                 cols[i].write("")
             else:
-                # Check if there are posts on this day
-                day_posts = [
-                    post for post in month_posts 
-                    if post.scheduled_time.day == day
-                ]
+                day_count = posts_per_day[day]
                 
-                if day_posts:
-                    cols[i].success(f"**{day}**\n{len(day_posts)} post(s)")
+                if day_count:
+                    cols[i].success(f"**{day}**\n{day_count} post(s)")
                 else:
                     cols[i].write(f"{day}")
     
@@ -575,7 +696,7 @@ def calendar_page():
     if month_posts:
         for post in sorted(month_posts, key=lambda x: x.scheduled_time):
             with st.expander(f"{post.scheduled_time.strftime('%Y-%m-%d %H:%M')} - {post.post_type.value}"):
-                st.write(post.content[:200] + "..." if len(post.content) > 200 else post.content)
+                st.write(preview(post.content))
                 
                 col1, col2, col3 = st.columns(3)
                 with col1:
@@ -604,7 +725,7 @@ def calendar_page():
         if st.form_submit_button("Schedule Post"):
             if content:
                 post = LinkedInPost(
-                    post_id=str(uuid.uuid4()),
+                    post_id=_new_id(),
                     user_id=user.user_id,
                     content=content,
                     hashtags=[h.strip() for h in hashtags.split(",") if h.strip()],
@@ -613,6 +734,7 @@ def calendar_page():
                 )
                 
                 if services['db'].save_post(post):
+                    _bump_version('posts_version')
                     st.success("Post scheduled successfully!")
                     st.rerun()
                 else:
@@ -620,10 +742,17 @@ def calendar_page():
 
 # Analytics page
 def analytics_page():
+    import numpy as np
+    import pandas as pd
+    import plotly.express as px
+    import plotly.graph_objects as go
+    init_chart_template()
+    
     st.title("📊 Analytics")
     
     user = st.session_state.current_user
-    user_posts = services['db'].get_user_posts(user.user_id, limit=100)
+    user_posts = _cached_user_posts(user.user_id, st.session_state.get('posts_version', 0),
+                                    fields=ANALYTICS_POST_FIELDS)
     
     if not user_posts:
         st.info("No posts available for analysis. Create some content first!")
@@ -634,10 +763,25 @@ def analytics_page():
     
     col1, col2, col3, col4 = st.columns(4)
     
-    total_posts = len(user_posts)
-    total_likes = sum(post.likes_count for post in user_posts)
-    total_comments = sum(post.comments_count for post in user_posts)
-    avg_engagement = sum(post.engagement_rate for post in user_posts) / total_posts
+    # Create DataFrame for analysis
+    n_posts = len(user_posts)
+    contents = list(map(attrgetter('content'), user_posts))
+    hashtags = list(map(attrgetter('hashtags'), user_posts))
+    df = pd.DataFrame({
+        'date': [post.created_at.date() for post in user_posts],
+        'engagement_rate': list(map(attrgetter('engagement_rate'), user_posts)),
+        'likes': list(map(attrgetter('likes_count'), user_posts)),
+        'comments': list(map(attrgetter('comments_count'), user_posts)),
+        'shares': list(map(attrgetter('shares_count'), user_posts)),
+        'post_type': [post.post_type.value for post in user_posts],
+        'content_length': np.fromiter(map(len, contents), dtype=np.int32, count=n_posts),
+        'hashtag_count': np.fromiter(map(len, hashtags), dtype=np.int32, count=n_posts)
+    })
+    
+    total_posts = len(df)
+    total_likes = int(df['likes'].sum())
+    total_comments = int(df['comments'].sum())
+    avg_engagement = df['engagement_rate'].mean()
     
     col1.metric("Total Posts", total_posts)
     col2.metric("Total Likes", total_likes)
@@ -647,21 +791,13 @@ def analytics_page():
     # Engagement trends
     st.subheader("Engagement Trends")
     
-    # Create DataFrame for analysis
-    df = pd.DataFrame([{
-        'date': post.created_at.date(),
-        'engagement_rate': post.engagement_rate,
-        'likes': post.likes_count,
-        'comments': post.comments_count,
-        'shares': post.shares_count,
-        'post_type': post.post_type.value,
-        'content_length': len(post.content),
-        'hashtag_count': len(post.hashtags)
-    } for post in user_posts])
-    
-    # Engagement over time
-    fig = px.line(df, x='date', y='engagement_rate', 
-                  title='Engagement Rate Over Time')
+    # Engagement over time, averaged per day and thinned out for long histories
+    daily = df.groupby('date', as_index=False).agg(engagement_rate=('engagement_rate', 'mean'))
+    if len(daily) > MAX_CHART_POINTS:
+        # Ceiling division, so the thinned series never exceeds the cap
+        daily = daily.iloc[::-(-len(daily) // MAX_CHART_POINTS)]
+    fig = go.Figure(go.Scattergl(x=daily['date'], y=daily['engagement_rate'], mode='lines'))
+    fig.update_layout(title='Engagement Rate Over Time')
     st.plotly_chart(fig, use_container_width=True)
     
     # Post type performance
@@ -675,23 +811,28 @@ def analytics_page():
     
     with col2:
         # Content length vs engagement
-        fig = px.scatter(df, x='content_length', y='engagement_rate',
-                        title='Content Length vs Engagement')
+        fig = go.Figure(go.Scattergl(x=df['content_length'], y=df['engagement_rate'], mode='markers'))
+        fig.update_layout(title='Content Length vs Engagement')
         st.plotly_chart(fig, use_container_width=True)
     
     # Top performing posts
     st.subheader("Top Performing Posts")
-    top_posts = sorted(user_posts, key=lambda x: x.engagement_rate, reverse=True)[:5]
+    top_posts = heapq.nlargest(5, user_posts, key=attrgetter('engagement_rate'))
     
-    for i, post in enumerate(top_posts, 1):
-        with st.expander(f"#{i} - {post.engagement_rate:.1f}% engagement"):
-            st.write(post.content[:300] + "..." if len(post.content) > 300 else post.content)
-            
-            col1, col2, col3, col4 = st.columns(4)
-            col1.metric("Likes", post.likes_count)
-            col2.metric("Comments", post.comments_count)
-            col3.metric("Shares", post.shares_count)
-            col4.metric("Views", post.views_count)
+    # One table instead of an expander plus four metrics per post
+    top_df = pd.DataFrame({
+        'Engagement %': [post.engagement_rate for post in top_posts],
+        'Likes': [post.likes_count for post in top_posts],
+        'Comments': [post.comments_count for post in top_posts],
+        'Shares': [post.shares_count for post in top_posts],
+        'Views': [post.views_count for post in top_posts],
+        'Preview': [preview(post.content, 120) for post in top_posts]
+    }, index=range(1, len(top_posts) + 1))
+    st.dataframe(
+        top_df,
+        use_container_width=True,
+        column_config={'Engagement %': st.column_config.NumberColumn(format="%.1f%%")}
+    )
     
     # AI insights
     st.subheader("AI Insights")
@@ -716,23 +857,10 @@ def analytics_page():
                 
                 st.info(f"Performance Rating: {insights.get('performance_rating', 'N/A').title()}")
 
-# Settings page
-def settings_page():
-    st.title("⚙️ Settings")
-
-    user = st.session_state.current_user
-
-    # Initialize OAuth server state
-    if 'oauth_server_started' not in st.session_state:
-        st.session_state.oauth_server_started = False
-
-    # Check if OAuth handler is available
-    try:
-        from oauth_handler import start_oauth_server, get_oauth_result, clear_oauth_result
-        OAUTH_AVAILABLE = True
-    except ImportError:
-        OAUTH_AVAILABLE = False
-
+# Settings page sections. Each is a fragment, so a widget inside one
+# only reruns that section instead of the whole settings page.
+@st.fragment
+def linkedin_settings_section(user):
     # =================================================================
     # LINKEDIN INTEGRATION SECTION
     # =================================================================
@@ -742,15 +870,25 @@ def settings_page():
         # Test existing connection
         linkedin_service = services['linkedin']
 
-        with st.spinner("Testing LinkedIn connection..."):
-            connection_valid = linkedin_service.test_connection(user.linkedin_access_token)
+        # Re-check the connection at most every LINKEDIN_CHECK_TTL seconds per session
+        ss = st.session_state
+        now = time.time()
+        if now - ss.get('linkedin_conn_checked_at', 0) < LINKEDIN_CHECK_TTL:
+            profile = ss.linkedin_profile
+            connection_valid = ss.linkedin_conn_valid
+        else:
+            with st.spinner("Testing LinkedIn connection..."):
+                profile = _linkedin_profile(user.user_id, user.linkedin_access_token)
+                connection_valid = profile is not None and profile.get("id") is not None
+            ss.linkedin_profile = profile
+            ss.linkedin_conn_valid = connection_valid
+            ss.linkedin_conn_checked_at = now
 
         if connection_valid:
             st.success("✅ LinkedIn account connected and working!")
 
             # Show connected account info
         try:
-            profile = linkedin_service.get_user_profile(user.linkedin_access_token)
             if profile:
                 col1, col2 = st.columns([2, 1])
                 with col1:
@@ -771,6 +909,7 @@ def settings_page():
 
                 with col2:
                     if st.button("🔄 Refresh Profile"):
+                        _reset_linkedin_check(user.user_id)
                         st.rerun()
         except Exception as e:
             st.warning(f"Could not fetch profile details: {e}")
@@ -816,6 +955,7 @@ def settings_page():
                         if success:
                             user.linkedin_access_token = None
                             user.linkedin_refresh_token = None
+                            _reset_linkedin_check(user.user_id)
                             st.success("LinkedIn account disconnected successfully.")
                             st.rerun()
                         else:
@@ -839,6 +979,7 @@ def settings_page():
                     })
                     user.linkedin_access_token = None
                     user.linkedin_refresh_token = None
+                    _reset_linkedin_check(user.user_id)
                     st.info("Previous connection cleared. Please connect again below.")
                     st.rerun()
     else:
@@ -882,9 +1023,10 @@ def settings_page():
                             return
 
                     # Generate unique state for OAuth security
-                    oauth_state = str(uuid.uuid4())
+                    oauth_state = secrets.token_urlsafe(24)
                     st.session_state.oauth_state = oauth_state
                     st.session_state.oauth_timestamp = time.time()
+                    register_oauth_state(oauth_state)
 
                     # Generate LinkedIn authorization URL
                     auth_url = services['linkedin'].get_authorization_url(oauth_state)
@@ -916,46 +1058,47 @@ def settings_page():
 
             with col2:
                 if st.button("🔄 Check Status", help="Check if authorization was completed"):
-                    if 'oauth_state' in st.session_state:
+                    # Snapshot session state once; it is only written back when it changes
+                    pending_state = st.session_state.get('oauth_state')
+                    if pending_state:
                         # Check for timeout (5 minutes)
                         if time.time() - st.session_state.get('oauth_timestamp', 0) > 300:
                             st.warning("Authorization session expired. Please try connecting again.")
-                            if 'oauth_state' in st.session_state:
-                                del st.session_state.oauth_state
+                            clear_oauth_result(pending_state)
+                            del st.session_state.oauth_state
                             return
 
-                        oauth_result = get_oauth_result(st.session_state.oauth_state)
+                        with st.spinner("Waiting for LinkedIn authorization..."):
+                            oauth_result = wait_for_oauth_result(pending_state, timeout=10)
 
                         if oauth_result:
+                            # A state is single-use: drop it whatever the outcome
+                            clear_oauth_result(pending_state)
+                            del st.session_state.oauth_state
+
                             if oauth_result.get('success'):
                                 token_data = oauth_result.get('token_data', {})
                                 access_token = token_data.get('access_token')
                                 refresh_token = token_data.get('refresh_token')
 
                                 if access_token:
-                                    # Test the token immediately
-                                    if services['linkedin'].test_connection(access_token):
-                                        # Save tokens to database
-                                        update_success = services['db'].update_user(user.user_id, {
-                                            "linkedin_access_token": access_token,
-                                            "linkedin_refresh_token": refresh_token
-                                        })
+                                    # Test the token immediately, reusing the profile fetched during token exchange
+                                    profile = token_data.get('profile') or services['linkedin'].get_user_profile(access_token)
+                                    if profile and profile.get('id'):
+                                        # Save tokens to database while the profile goes to Redis
+                                        update_success = asyncio.run(_save_linkedin_connection(
+                                            user.user_id, access_token, refresh_token, profile
+                                        ))
 
                                         if update_success:
                                             user.linkedin_access_token = access_token
                                             user.linkedin_refresh_token = refresh_token
-                                            clear_oauth_result(st.session_state.oauth_state)
-
-                                            # Clean up session state
-                                            del st.session_state.oauth_state
 
                                             st.success("✅ LinkedIn connected successfully!")
                                             st.balloons()
 
                                             # Show profile info
-                                            profile = services['linkedin'].get_user_profile(access_token)
-                                            if profile:
-                                                st.info(f"Connected as: {profile.get('firstName', '')} {profile.get('lastName', '')}")
+                                            st.info(f"Connected as: {profile.get('firstName', '')} {profile.get('lastName', '')}")
 
                                             time.sleep(2)
                                             st.rerun()
@@ -968,9 +1111,6 @@ def settings_page():
                             else:
                                 error = oauth_result.get('error', 'Unknown error')
                                 st.error(f"LinkedIn authorization failed: {error}")
-                                clear_oauth_result(st.session_state.oauth_state)
-                                if 'oauth_state' in st.session_state:
-                                    del st.session_state.oauth_state
                         else:
                             st.info("⏳ Authorization in progress... Make sure you completed the LinkedIn authorization in the new tab.")
                     else:
@@ -981,8 +1121,8 @@ def settings_page():
             st.code("pip install flask", language="bash")
             st.write("Then restart the application.")
 
-    st.divider()
-
+@st.fragment
+def preferences_settings_section(user):
     # =================================================================
     # POSTING PREFERENCES SECTION
     # =================================================================
@@ -1012,18 +1152,17 @@ def settings_page():
             time_slots = []
 
             for i in range(3):
-                default_time_str = user.preferred_posting_times[i] if i < len(user.preferred_posting_times) else "09:00"
                 try:
-                    default_time = datetime.strptime(default_time_str, "%H:%M").time()
-                except:
-                    default_time = datetime.strptime("09:00", "%H:%M").time()
+                    default_time = dt_time.fromisoformat(user.preferred_posting_times[i])
+                except (IndexError, ValueError):
+                    default_time = DEFAULT_SLOT_TIMES[i]
 
                 time_slot = st.time_input(
                     f"Time slot {i+1}",
                     value=default_time,
                     help=f"Preferred time for posting slot {i+1}"
                 )
-                time_slots.append(time_slot.strftime("%H:%M"))
+                time_slots.append(f"{time_slot.hour:02d}:{time_slot.minute:02d}")
 
         st.write("**🎯 Content Preferences**")
         col3, col4 = st.columns(2)
@@ -1031,7 +1170,7 @@ def settings_page():
         with col3:
             default_post_length = st.selectbox(
                 "Default post length",
-                ["Short (< 300 chars)", "Medium (300-800 chars)", "Long (800+ chars)"],
+                POST_LENGTH_CHOICES,
                 index=1
             )
 
@@ -1061,8 +1200,8 @@ def settings_page():
             else:
                 st.error("❌ Failed to update preferences.")
 
-    st.divider()
-
+@st.fragment
+def account_settings_section(user, stats):
     # =================================================================
     # ACCOUNT & PROFILE SECTION
     # =================================================================
@@ -1072,11 +1211,15 @@ def settings_page():
 
     with col1:
         st.write("**Account Information**")
-        st.info(f"**User ID:** {user.user_id}")
-        st.info(f"**Email:** {user.email}")
-        st.info(f"**Name:** {user.full_name}")
-        st.info(f"**Industry:** {user.industry}")
-        st.info(f"**Company:** {user.company}")
+        st.markdown(f"""
+| Field | Value |
+|---|---|
+| User ID | `{user.user_id}` |
+| Email | {user.email} |
+| Name | {user.full_name} |
+| Industry | {user.industry} |
+| Company | {user.company} |
+""")
 
         if st.button("✏️ Edit Profile"):
             st.info("Use the Profile Setup page to edit your profile details.")
@@ -1084,24 +1227,21 @@ def settings_page():
     with col2:
         st.write("**Account Statistics**")
 
-        # Get user statistics
-        user_posts = services['db'].get_user_posts(user.user_id, limit=1000)
-        total_posts = len(user_posts)
         scheduled_posts = len(services['db'].get_scheduled_posts(user.user_id))
 
-        avg_engagement = sum(post.engagement_rate for post in user_posts) / max(total_posts, 1)
+        avg_engagement = stats['avg_engagement'] or 0.0
 
         col_stat1, col_stat2 = st.columns(2)
         with col_stat1:
-            st.metric("Total Posts", total_posts)
+            st.metric("Total Posts", stats['total_posts'])
             st.metric("Scheduled Posts", scheduled_posts)
 
         with col_stat2:
             st.metric("Avg Engagement", f"{avg_engagement:.1f}%")
             st.metric("Account Age", f"{(datetime.now() - user.created_at).days} days")
 
-    st.divider()
-
+@st.fragment
+def data_management_section(user, stats):
     # =================================================================
     # DATA MANAGEMENT SECTION
     # =================================================================
@@ -1117,8 +1257,9 @@ def settings_page():
             with st.spinner("Preparing your data export..."):
                 try:
                     # Gather all user data
-                    user_posts = services['db'].get_user_posts(user.user_id, limit=1000)
-                    strategy = services['db'].get_content_strategy(user.user_id)
+                    # Raw documents serialize straight through orjson, skipping the models
+                    user_posts = services['db'].get_user_posts(user.user_id, limit=1000, raw=True)
+                    strategy = services['db'].get_content_strategy(user.user_id, raw=True)
 
                     export_data = {
                         "export_info": {
@@ -1126,20 +1267,21 @@ def settings_page():
                             "user_id": user.user_id,
                             "version": "1.0"
                         },
-                        "profile": user.dict(),
-                        "content_strategy": strategy.dict() if strategy else None,
-                        "posts": [post.dict() for post in user_posts],
+                        "profile": user.model_dump(mode="json"),
+                        "content_strategy": strategy,
+                        "posts": user_posts,
                         "statistics": {
-                            "total_posts": len(user_posts),
-                            "total_likes": sum(post.likes_count for post in user_posts),
-                            "total_comments": sum(post.comments_count for post in user_posts),
-                            "total_shares": sum(post.shares_count for post in user_posts),
-                            "average_engagement": avg_engagement
+                            "total_posts": stats['total_posts'],
+                            "total_likes": stats['total_likes'],
+                            "total_comments": stats['total_comments'],
+                            "total_shares": stats['total_shares'],
+                            "average_engagement": stats['avg_engagement'] or 0.0
                         }
                     }
 
-                    # Convert to JSON with proper formatting
-                    json_data = json.dumps(export_data, indent=2, default=str)
+                    # Posts and strategy are raw Mongo documents; orjson handles their datetimes,
+                    # and any other BSON type (ObjectId, Decimal128, ...) is written as a string
+                    json_data = orjson.dumps(export_data, default=str, option=orjson.OPT_INDENT_2)
 
                     st.download_button(
                         label="💾 Download JSON Export",
@@ -1161,10 +1303,7 @@ def settings_page():
         st.warning("⚠️ **Warning**: This action cannot be undone!")
 
         # Two-step deletion process for safety
-        if 'deletion_confirmed' not in st.session_state:
-            st.session_state.deletion_confirmed = False
-
-        if not st.session_state.deletion_confirmed:
+        if not st.session_state.get('deletion_confirmed', False):
             if st.button("🗑️ Request Data Deletion", type="secondary"):
                 st.session_state.deletion_confirmed = True
                 st.rerun()
@@ -1187,14 +1326,15 @@ def settings_page():
                 if st.button("💥 PERMANENTLY DELETE", type="secondary"):
                     try:
                         # Delete all user data
-                        services['db'].users.delete_one({"user_id": user.user_id})
-                        services['db'].posts.delete_many({"user_id": user.user_id})
-                        services['db'].content_strategies.delete_one({"user_id": user.user_id})
-                        services['db'].calendars.delete_many({"user_id": user.user_id})
+                        if not services['db'].delete_user_data(user.user_id):
+                            raise RuntimeError("database delete failed")
 
                         # Clear cache
-                        services['cache'].delete(f"session:{user.user_id}")
-                        services['cache'].delete(f"content_ideas:{user.user_id}")
+                        services['cache'].delete(
+                            f"session:{user.user_id}",
+                            f"content_ideas:{user.user_id}",
+                            f"profile:{user.user_id}"
+                        )
 
                         # Clear session
                         st.session_state.user_id = None
@@ -1209,8 +1349,8 @@ def settings_page():
                     except Exception as e:
                         st.error(f"Failed to delete data: {e}")
 
-    st.divider()
-
+@st.fragment
+def advanced_settings_section(user):
     # =================================================================
     # ADVANCED SETTINGS SECTION
     # =================================================================
@@ -1223,8 +1363,11 @@ def settings_page():
             st.write("**Cache Management**")
             if st.button("🧹 Clear Cache"):
                 try:
-                    services['cache'].delete(f"session:{user.user_id}")
-                    services['cache'].delete(f"content_ideas:{user.user_id}")
+                    services['cache'].delete(
+                        f"session:{user.user_id}",
+                        f"content_ideas:{user.user_id}",
+                        f"profile:{user.user_id}"
+                    )
                     st.success("Cache cleared successfully!")
                 except Exception as e:
                     st.error(f"Failed to clear cache: {e}")
@@ -1247,12 +1390,36 @@ def settings_page():
             "LinkedIn Connected": bool(user.linkedin_access_token),
         }
 
-        for key, value in debug_info.items():
-            st.write(f"• **{key}**: {value}")
+        st.markdown("| Key | Value |\n|---|---|\n" + "\n".join(
+            f"| {key} | {value} |" for key, value in debug_info.items()
+        ))
 
         if st.button("📋 Copy Debug Info"):
             st.code(json.dumps(debug_info, indent=2))
 
+# Settings page
+def settings_page():
+    st.title("⚙️ Settings")
+
+    user = st.session_state.current_user
+
+    # Initialize OAuth server state
+    if 'oauth_server_started' not in st.session_state:
+        st.session_state.oauth_server_started = False
+
+    # Post statistics are shared by the account and data management sections
+    stats = services['db'].get_user_post_stats(user.user_id)
+
+    linkedin_settings_section(user)
+    st.divider()
+    preferences_settings_section(user)
+    st.divider()
+    account_settings_section(user, stats)
+    st.divider()
+    data_management_section(user, stats)
+    st.divider()
+    advanced_settings_section(user)
+
     # Footer
     st.divider()
     st.markdown("---")
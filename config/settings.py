@@ -1,8 +1,13 @@
 import os
+from typing import Final
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Content Settings
+MAX_POST_LENGTH: Final = 3000
+DEFAULT_POSTING_TIMES: Final = ("09:00", "13:00", "17:00")
+
 class Settings:
     # Database
     MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
@@ -20,9 +25,5 @@ class Settings:
     
     # App Settings
     SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here")
-    
-    # Content Settings
-    MAX_POST_LENGTH = 3000
-    DEFAULT_POSTING_TIMES = ["09:00", "13:00", "17:00"]
 
 settings = Settings()
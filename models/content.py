@@ -1,6 +1,6 @@
 from datetime import datetime
 from typing import List, Optional, Dict
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 from enum import Enum
 
 class PostType(str, Enum):
@@ -43,6 +43,9 @@ class LinkedInPost(BaseModel):
     
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    # Set by DatabaseService when read back: "full" or "projection"
+    _loaded: Optional[str] = PrivateAttr(default=None)
 
 class ContentCalendar(BaseModel):
     user_id: str
@@ -51,3 +54,6 @@ class ContentCalendar(BaseModel):
     scheduled_posts: List[str] = []  # List of post_ids
     content_themes: Dict[str, List[str]] = {}  # Week -> themes
     updated_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    # Set by DatabaseService when read back: "full" or "projection"
+    _loaded: Optional[str] = PrivateAttr(default=None)
@@ -1,6 +1,6 @@
 from datetime import datetime
 from typing import List, Optional
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 
 class UserProfile(BaseModel):
     user_id: str = Field(..., description="Unique user identifier")
@@ -28,10 +28,13 @@ class ContentStrategy(BaseModel):
     hashtag_strategy: List[str] = []
     competitor_profiles: List[str] = []
     trending_topics: List[str] = []
-    content_mix: dict = {  # Percentage distribution
+    content_mix: dict = Field(default_factory=lambda: {  # Percentage distribution
         "thought_leadership": 30,
         "industry_insights": 25,
         "personal_experience": 25,
         "company_updates": 20
-    }
+    })
     updated_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    # Set by DatabaseService when read back: "full" or "projection"
+    _loaded: Optional[str] = PrivateAttr(default=None)
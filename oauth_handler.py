@@ -5,11 +5,46 @@ import time
 from services.linkedin_service import LinkedInService
 from services.database_service import DatabaseService
 
+try:
+    from waitress import serve
+    WAITRESS_AVAILABLE = True
+except ImportError:
+    WAITRESS_AVAILABLE = False
+
 app = Flask(__name__)
 linkedin_service = LinkedInService()
 db_service = DatabaseService()
 
+# Callback results keyed by OAuth state, shared between the Flask and Streamlit threads
+OAUTH_RESULT_TTL = 600
+OAUTH_RESULTS_MAX = 2048
+_oauth_lock = threading.Lock()
 oauth_results = {}
+# Set when the callback for a state arrives, so waiters wake immediately
+_pending = {}
+
+def _store_oauth_result(state: str, result: dict):
+    """Store a callback result, evicting expired entries and capping the size"""
+    now = time.monotonic()
+    with _oauth_lock:
+        # Insertion order is arrival order, so expired entries are at the front
+        while oauth_results:
+            oldest_state, (stored_at, _) = next(iter(oauth_results.items()))
+            if now - stored_at <= OAUTH_RESULT_TTL and len(oauth_results) < OAUTH_RESULTS_MAX:
+                break
+            del oauth_results[oldest_state]
+        oauth_results.pop(state, None)
+        oauth_results[state] = (now, result)
+        event = _pending.get(state)
+    if event is not None:
+        event.set()
+
+def register_oauth_state(state: str):
+    """Start tracking a newly issued state so its result can be waited on"""
+    with _oauth_lock:
+        if len(_pending) >= OAUTH_RESULTS_MAX:
+            del _pending[next(iter(_pending))]
+        _pending[state] = threading.Event()
 
 @app.route('/linkedin/callback')
 def linkedin_callback():
@@ -24,11 +59,11 @@ def linkedin_callback():
         print(f"LinkedIn OAuth Error: {error}")
         print(f"Error Description: {error_description}")
         
-        oauth_results[state] = {
+        _store_oauth_result(state, {
             'success': False, 
             'error': error,
             'error_description': error_description
-        }
+        })
         
         return f"""
         <html>
@@ -55,10 +90,10 @@ def linkedin_callback():
         token_data = linkedin_service.exchange_code_for_token(code)
         
         if token_data:
-            oauth_results[state] = {
+            _store_oauth_result(state, {
                 'success': True, 
                 'token_data': token_data
-            }
+            })
             return f"""
             <html>
             <body>
@@ -70,7 +105,7 @@ def linkedin_callback():
             </html>
             """
         else:
-            oauth_results[state] = {'success': False, 'error': 'Token exchange failed'}
+            _store_oauth_result(state, {'success': False, 'error': 'Token exchange failed'})
             return f"""
             <html>
             <body>
@@ -87,7 +122,10 @@ def linkedin_callback():
 def run_oauth_server():
     """Run the OAuth callback server"""
     try:
-        app.run(host='localhost', port=8502, debug=False, use_reloader=False)
+        if WAITRESS_AVAILABLE:
+            serve(app, host='localhost', port=8502, threads=8, _quiet=True)
+        else:
+            app.run(host='localhost', port=8502, debug=False, use_reloader=False, threaded=True)
     except Exception as e:
         print(f"Failed to start OAuth server: {e}")
 
@@ -99,9 +137,22 @@ def start_oauth_server():
 
 def get_oauth_result(state: str) -> dict:
     """Get OAuth result for given state"""
-    return oauth_results.get(state, {})
+    with _oauth_lock:
+        entry = oauth_results.get(state)
+    if entry is None or time.monotonic() - entry[0] > OAUTH_RESULT_TTL:
+        return {}
+    return entry[1]
+
+def wait_for_oauth_result(state: str, timeout: float = 10) -> dict:
+    """Block until the callback for state arrives or timeout elapses"""
+    with _oauth_lock:
+        event = _pending.get(state)
+    if event is not None:
+        event.wait(timeout)
+    return get_oauth_result(state)
 
 def clear_oauth_result(state: str):
     """Clear OAuth result for given state"""
-    if state in oauth_results:
-        del oauth_results[state]
+    with _oauth_lock:
+        oauth_results.pop(state, None)
+        _pending.pop(state, None)
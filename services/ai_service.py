@@ -1,108 +1,530 @@
 import google.generativeai as genai
+import asyncio
+import base64
+import hashlib
+import importlib.util
 import logging
-import json
+import orjson
+import random
 import re
-from typing import List, Dict, Optional
-from config.settings import settings
+import threading
+import time
+import numpy as np
+from collections import OrderedDict
+from google.api_core.exceptions import DeadlineExceeded, ResourceExhausted, ServiceUnavailable
+from pydantic import BaseModel, ValidationError
+from types import MappingProxyType
+from typing import List, Dict, Mapping, Optional, Tuple
+from config.settings import settings, MAX_POST_LENGTH
 from models.user import UserProfile, ContentStrategy
 from models.content import LinkedInPost, PostType
+from services.cache_service import CacheService
+
+# Checked without importing, so torch is only loaded once an embedding is needed
+EMBEDDINGS_AVAILABLE = importlib.util.find_spec('sentence_transformers') is not None
 
 logger = logging.getLogger(__name__)
 
-class AIService:
+# Semantic response cache
+EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
+SEMANTIC_CACHE_THRESHOLD = 0.92
+SEMANTIC_CACHE_CANDIDATES = 50
+SEMANTIC_CACHE_TTL = 86400
+# In-process embedding matrices: how long before re-reading Redis, and how many namespaces to hold
+SEMANTIC_INDEX_REFRESH = 300
+SEMANTIC_INDEX_MAX_NAMESPACES = 256
+# Exact-prompt responses kept in process memory in front of Redis
+LOCAL_CACHE_SIZE = 256
+
+_embed_model = None
+_embed_lock = threading.Lock()
+
+def _get_embedder():
+    """Load the sentence embedding model once per process, on first use"""
+    global _embed_model
+    if _embed_model is None:
+        with _embed_lock:
+            if _embed_model is None:
+                from sentence_transformers import SentenceTransformer
+                _embed_model = SentenceTransformer(EMBEDDING_MODEL, device='cpu')
+    return _embed_model
+
+# Response parsing patterns
+_HASHTAG_RE = re.compile(r"#?(\w{3,})")
+
+class _JsonSpanScanner:
+    """Bracket-balanced scan for the first JSON object or array, fed text incrementally"""
+    
     def __init__(self):
-        genai.configure(api_key=settings.GEMINI_API_KEY)
-        self.model = genai.GenerativeModel('gemini-2.5-flash')
+        self.start = None
+        self.end = None
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+    
+    def feed(self, text: str) -> bool:
+        """Consume more text; returns True once the value is complete"""
+        for i, ch in enumerate(text, self._pos):
+            if self.start is None:
+                if ch == '{' or ch == '[':
+                    self.start, self._depth = i, 1
+            elif self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == '{' or ch == '[':
+                self._depth += 1
+            elif ch == '}' or ch == ']':
+                self._depth -= 1
+                if self._depth == 0:
+                    self.end = i + 1
+                    return True
+        self._pos += len(text)
+        return False
+
+def _find_json_span(text: str) -> Optional[Tuple[int, int]]:
+    """Locate the first balanced JSON object or array in text in a single pass"""
+    scanner = _JsonSpanScanner()
+    return (scanner.start, scanner.end) if scanner.feed(text) else None
+
+def _prompt_fields(*fields: Tuple[str, object]) -> str:
+    """Render "Label: value" prompt lines, leaving out empty values"""
+    lines = []
+    for label, value in fields:
+        if isinstance(value, (list, tuple)):
+            value = ', '.join(value)
+        if value:
+            lines.append(f"{label}: {value}")
+    return '\n'.join(lines)
+
+GEMINI_MODEL = 'gemini-2.5-flash'
+
+# Transient Gemini errors are retried with jittered exponential backoff
+GEMINI_RETRY_ATTEMPTS = 3
+GEMINI_RETRY_MAX_DELAY = 8
+_RETRYABLE_ERRORS = (ResourceExhausted, ServiceUnavailable, DeadlineExceeded)
+
+# Stable per-template instructions, sent as the system instruction so each
+# request only carries the user-specific block
+SYSTEM_INSTRUCTIONS = {
+    'strategy': """
+        You create comprehensive LinkedIn content strategies from a user profile.
+        - content_pillars: 4-5 main themes for content creation
+        - hashtag_strategy: 15-20 hashtags (without # symbol)
+        - trending_topics: 8-10 current industry trends
+        - content_ideas: 15-20 specific post ideas
+        - content_mix: percentage distribution summing to 100
+        """,
+    'post': f"""
+        You write LinkedIn posts for a user on a given topic.
+        - content: at most {MAX_POST_LENGTH} characters, engaging and professional, matching
+          the brand voice, with a relevant call-to-action, optimized for the LinkedIn algorithm
+        - hashtags: 3-5 hashtags (without # symbol)
+        - engagement_hooks: engagement strategies used
+        - confidence_score: number between 0 and 1
+        """,
+    'ideas': """
+        You generate the requested number of LinkedIn content ideas for a professional: relevant to their
+        industry and role, engaging and shareable, a mix of educational, inspirational and
+        personal content, suitable for a LinkedIn professional audience.
+        """,
+    'analysis': """
+        You analyze the performance of LinkedIn posts.
+        - performance_rating: "excellent", "good", "average", or "poor"
+        - key_insights: what worked/didn't work
+        - improvement_suggestions: specific suggestions
+        - content_score: number between 0-100
+        """,
+    'hashtags': """
+        You generate 10 optimized LinkedIn hashtags (without # symbol) for a piece of content:
+        a mix of popular and niche tags relevant to the content and industry, balancing reach
+        and engagement potential.
+        """,
+}
+
+# Response schemas enforced through Gemini's JSON mode
+class ContentMixSchema(BaseModel):
+    thought_leadership: int
+    industry_insights: int
+    personal_experience: int
+    company_updates: int
+
+class StrategySchema(BaseModel):
+    content_pillars: List[str]
+    hashtag_strategy: List[str]
+    trending_topics: List[str]
+    content_ideas: List[str]
+    content_mix: ContentMixSchema
+
+class PostSchema(BaseModel):
+    content: str
+    hashtags: List[str]
+    engagement_hooks: List[str]
+    confidence_score: float
+
+class AnalysisSchema(BaseModel):
+    performance_rating: str
+    key_insights: List[str]
+    improvement_suggestions: List[str]
+    content_score: int
+
+RESPONSE_SCHEMAS = {
+    'strategy': StrategySchema,
+    'post': PostSchema,
+    'ideas': List[str],
+    'analysis': AnalysisSchema,
+    'hashtags': List[str],
+}
+
+# Fallbacks used when generation fails. Frozen so they can be shared safely;
+# callers get fresh mutable copies via _thaw.
+_DEFAULT_BASE_TAGS = ("linkedin", "professional", "career", "networking")
+
+_DEFAULT_STRATEGY = MappingProxyType({
+    "content_pillars": (
+        "Industry Insights", 
+        "Professional Growth", 
+        "Leadership", 
+        "Innovation", 
+        "Career Development"
+    ),
+    "hashtag_strategy": (
+        "linkedin", "professional", "career", "leadership", "growth", 
+        "industry", "business", "networking", "success", "motivation",
+        "innovation", "development", "skills", "workplace", "team"
+    ),
+    "trending_topics": (
+        "AI trends", "Remote work", "Digital transformation", 
+        "Industry innovation", "Professional development",
+        "Leadership skills", "Career growth", "Workplace culture"
+    ),
+    "content_ideas": (
+        "Share a professional achievement",
+        "Industry prediction for next year", 
+        "Career advice for newcomers",
+        "Lessons learned from recent project",
+        "Thoughts on industry trends",
+        "Team collaboration success story",
+        "Professional development tips",
+        "Industry best practices"
+    ),
+    "content_mix": MappingProxyType({
+        "thought_leadership": 30,
+        "industry_insights": 25,
+        "personal_experience": 25,
+        "company_updates": 20
+    })
+})
+
+_DEFAULT_POST = MappingProxyType({
+    "content": "Sharing my thoughts on {topic}. This is an important topic in our industry, and I believe it's worth discussing. What's your perspective on this? I'd love to hear your thoughts in the comments.",
+    "hashtags": ("linkedin", "professional", "networking", "industry", "discussion"),
+    "engagement_hooks": ("question", "call-to-action", "personal-opinion"),
+    "confidence_score": 0.6
+})
+
+_DEFAULT_IDEAS = (
+    "Share a recent professional achievement",
+    "Discuss current industry trends and predictions",
+    "Provide career advice for newcomers in your field",
+    "Share lessons learned from recent failures or challenges",
+    "Highlight successful team collaboration",
+    "Discuss emerging technologies in your industry",
+    "Share insights from recent professional development",
+    "Discuss work-life balance strategies",
+    "Share thoughts on leadership and management",
+    "Discuss industry best practices"
+)
+
+_DEFAULT_ANALYSIS = MappingProxyType({
+    "performance_rating": "average",
+    "key_insights": (
+        "Standard engagement levels for this type of content",
+        "Post timing may have affected reach",
+        "Content resonated with core audience"
+    ),
+    "improvement_suggestions": (
+        "Add more engaging visuals or media",
+        "Include a clear call-to-action",
+        "Post during peak engagement hours",
+        "Use more relevant hashtags"
+    ),
+    "content_score": 60
+})
+
+def _thaw(defaults: Mapping) -> Dict:
+    """Mutable copy of a frozen defaults mapping"""
+    return {
+        key: list(value) if isinstance(value, tuple) else dict(value) if isinstance(value, Mapping) else value
+        for key, value in defaults.items()
+    }
+
+class AIService:
+    def __init__(self, cache: Optional[CacheService] = None):
+        # One long-lived HTTP/2 channel, shared by every request from this process
+        genai.configure(api_key=settings.GEMINI_API_KEY, transport="grpc")
+        self.models = {
+            kind: genai.GenerativeModel(
+                GEMINI_MODEL,
+                system_instruction=instruction,
+                generation_config=genai.GenerationConfig(
+                    response_mime_type="application/json",
+                    response_schema=RESPONSE_SCHEMAS[kind]
+                )
+            )
+            for kind, instruction in SYSTEM_INSTRUCTIONS.items()
+        }
+        self.cache = cache
+        # Off the constructor's path, so a slow or unreachable API doesn't delay startup
+        threading.Thread(target=self._warm_up, daemon=True).start()
+        # namespace -> (loaded_at, entry keys, fp16 matrix with one row per key), newest first
+        self._emb_index = OrderedDict()
+        self._emb_lock = threading.Lock()
+        # cache key -> (stored_at, response text), least recently used first
+        self._local_cache = OrderedDict()
+        self._local_lock = threading.Lock()
+    
+    def _warm_up(self):
+        """Open the gRPC channel now rather than on the first user request"""
+        try:
+            next(iter(genai.list_models(page_size=1)), None)
+        except Exception as e:
+            logger.warning(f"Could not pre-warm Gemini connection: {e}")
+    
+    def _embed(self, text: str) -> Optional[np.ndarray]:
+        """Normalized fp16 embedding of a prompt, or None when embeddings are unavailable"""
+        if not EMBEDDINGS_AVAILABLE:
+            return None
+        try:
+            embedding = _get_embedder().encode([text], normalize_embeddings=True, convert_to_numpy=True)[0]
+            return embedding.astype(np.float16)
+        except Exception as e:
+            logger.error(f"Error embedding prompt: {e}")
+            return None
+    
+    def _namespace_embeddings(self, namespace: str, index_key: str,
+                              dim: int) -> Tuple[List[str], Optional[np.ndarray]]:
+        """Entry keys and stacked embeddings for a namespace, rebuilt from Redis when stale"""
+        now = time.monotonic()
+        with self._emb_lock:
+            loaded = self._emb_index.get(namespace)
+            if loaded and now - loaded[0] < SEMANTIC_INDEX_REFRESH:
+                self._emb_index.move_to_end(namespace)
+                return loaded[1], loaded[2]
+        
+        keys, rows = [], []
+        index_keys = self.cache.get_recent(index_key)
+        if index_keys:
+            for key, entry in zip(index_keys, self.cache.get_many(index_keys)):
+                if not entry or 'emb' not in entry:
+                    continue
+                row = np.frombuffer(base64.b64decode(entry['emb']), dtype=np.float16)
+                if row.shape[0] == dim:
+                    keys.append(key)
+                    rows.append(row)
+        matrix = np.vstack(rows) if rows else None
+        
+        with self._emb_lock:
+            self._emb_index[namespace] = (now, keys, matrix)
+            self._emb_index.move_to_end(namespace)
+            if len(self._emb_index) > SEMANTIC_INDEX_MAX_NAMESPACES:
+                self._emb_index.popitem(last=False)
+        return keys, matrix
+    
+    def _remember_embedding(self, namespace: str, key: str, embedding: np.ndarray):
+        """Add a freshly cached entry to the namespace's in-process matrix"""
+        with self._emb_lock:
+            loaded = self._emb_index.get(namespace)
+            if loaded is None or key in loaded[1]:
+                return
+            loaded_at, keys, matrix = loaded
+            row = embedding[np.newaxis, :]
+            matrix = row if matrix is None else np.vstack((row, matrix))[:SEMANTIC_CACHE_CANDIDATES]
+            self._emb_index[namespace] = (loaded_at, ([key] + keys)[:SEMANTIC_CACHE_CANDIDATES], matrix)
+    
+    def _semantic_lookup(self, namespace: str, index_key: str, embedding: np.ndarray) -> Optional[str]:
+        """Return the cached response whose prompt is most similar, if close enough"""
+        keys, matrix = self._namespace_embeddings(namespace, index_key, embedding.shape[0])
+        if matrix is None:
+            return None
+        
+        # One matmul over all candidates; fp16 storage is upcast for the product
+        sims = matrix.astype(np.float32) @ embedding.astype(np.float32)
+        best = int(np.argmax(sims))
+        if sims[best] <= SEMANTIC_CACHE_THRESHOLD:
+            return None
+        
+        entry = self.cache.get(keys[best])
+        return entry['response'] if entry else None
+    
+    def _generate(self, kind: str, prompt: str, stream: bool = False) -> str:
+        """Call the template model, retrying rate limits, unavailability and timeouts"""
+        for attempt in range(1, GEMINI_RETRY_ATTEMPTS + 1):
+            try:
+                return self._generate_once(kind, prompt, stream)
+            except _RETRYABLE_ERRORS as e:
+                if attempt == GEMINI_RETRY_ATTEMPTS:
+                    raise
+                delay = min(GEMINI_RETRY_MAX_DELAY, 0.5 * 2 ** attempt) * random.uniform(0.5, 1)
+                logger.warning(f"Gemini {kind} call failed ({e}); retry {attempt} in {delay:.1f}s")
+                time.sleep(delay)
+    
+    def _generate_once(self, kind: str, prompt: str, stream: bool) -> str:
+        """Call the template model; when streaming, stop reading once the JSON value closes"""
+        model = self.models[kind]
+        if not stream:
+            return model.generate_content(prompt).text
+        
+        scanner = _JsonSpanScanner()
+        parts = []
+        for chunk in model.generate_content(prompt, stream=True):
+            if not chunk.parts:
+                continue
+            parts.append(chunk.text)
+            if scanner.feed(chunk.text):
+                break
+        text = ''.join(parts)
+        return text[scanner.start:scanner.end] if scanner.end else text
+    
+    def _local_get(self, key: str) -> Optional[str]:
+        """Response from the in-process cache, if present and not expired"""
+        with self._local_lock:
+            entry = self._local_cache.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] > SEMANTIC_CACHE_TTL:
+                del self._local_cache[key]
+                return None
+            self._local_cache.move_to_end(key)
+            return entry[1]
+    
+    def _local_put(self, key: str, text: str):
+        with self._local_lock:
+            self._local_cache[key] = (time.monotonic(), text)
+            self._local_cache.move_to_end(key)
+            if len(self._local_cache) > LOCAL_CACHE_SIZE:
+                self._local_cache.popitem(last=False)
+    
+    def _cached_generate(self, kind: str, prompt: str, scope: str = '', use_cache: bool = True,
+                         stream: bool = False, semantic_text: Optional[str] = None) -> str:
+        """Generate a response with the template model for `kind`, reusing one cached for an
+        identical prompt or, when `semantic_text` is given, for one whose semantic_text is
+        near-identical within the same `scope`. Pass only free text as semantic_text and fold
+        every structured input into the scope, so those must match exactly."""
+        namespace = f"{kind}:{scope}" if scope else kind
+        key = f"llm:{namespace}:{hashlib.sha1(prompt.encode()).hexdigest()}"
+        index_key = f"llm:{namespace}:index"
+        
+        if use_cache:
+            text = self._local_get(key)
+            if text is not None:
+                return text
+            
+            entry = self.cache.get(key) if self.cache else None
+            if entry:
+                self._local_put(key, entry['response'])
+                return entry['response']
         
+        embedding = self._embed(semantic_text) if self.cache and semantic_text else None
+        if use_cache and embedding is not None:
+            response = self._semantic_lookup(namespace, index_key, embedding)
+            if response is not None:
+                return response
+        
+        text = self._generate(kind, prompt, stream)
+        
+        # Only keep responses that parse, so a malformed one isn't replayed for a day
+        try:
+            self._extract_json_from_response(text)
+        except ValueError:
+            return text
+        
+        self._local_put(key, text)
+        if self.cache is None:
+            return text
+        
+        entry = {'response': text}
+        if embedding is not None:
+            entry['emb'] = base64.b64encode(embedding.tobytes()).decode()
+        self.cache.set(key, entry, SEMANTIC_CACHE_TTL)
+        self.cache.push_recent(index_key, key, SEMANTIC_CACHE_CANDIDATES, SEMANTIC_CACHE_TTL)
+        if embedding is not None:
+            self._remember_embedding(namespace, key, embedding)
+        return text
+        
+    def _parse_structured(self, schema: type, content: str) -> Dict:
+        """Validate a JSON-mode response, falling back to lenient extraction"""
+        try:
+            return schema.model_validate_json(content).model_dump()
+        except ValidationError:
+            return self._extract_json_from_response(content)
+    
     def _extract_json_from_response(self, content: str) -> Dict:
         """Extract JSON from AI response, handling various formats"""
         try:
             # Try to parse the entire content as JSON first
-            return json.loads(content.strip())
-        except json.JSONDecodeError:
+            return orjson.loads(content.strip())
+        except orjson.JSONDecodeError:
             pass
         
-        # Look for JSON within markdown code blocks
-        json_patterns = [
-            r'``````',
-            r'``````',
-            r'\{.*\}',
-        ]
-        
-        for pattern in json_patterns:
-            matches = re.findall(pattern, content, re.DOTALL)
-            if matches:
-                try:
-                    # Take the first match and try to parse it
-                    json_text = matches[0].strip()
-                    return json.loads(json_text)
-                except json.JSONDecodeError:
-                    continue
+        # Otherwise take the first balanced object/array, skipping any prose or code fence
+        span = _find_json_span(content)
+        if span:
+            try:
+                return orjson.loads(content[span[0]:span[1]])
+            except orjson.JSONDecodeError:
+                pass
         
         # If no valid JSON found, raise an error
         raise ValueError("No valid JSON found in response")
     
     def _normalize_hashtag_strategy(self, hashtag_data) -> List[str]:
-        """Convert hashtag data to flat list format"""
+        """Convert hashtag data to a flat, de-duplicated list of lowercase tags"""
         if isinstance(hashtag_data, list):
-            # Already in correct format
-            return [tag.replace('#', '') for tag in hashtag_data if isinstance(tag, str)]
+            tags = hashtag_data
         elif isinstance(hashtag_data, dict):
-            # Convert dictionary to flat list
-            hashtags = []
-            for category, tags in hashtag_data.items():
-                if isinstance(tags, list):
-                    hashtags.extend([tag.replace('#', '') for tag in tags if isinstance(tag, str)])
-                elif isinstance(tags, str):
-                    hashtags.append(tags.replace('#', ''))
-            return hashtags
+            # Flatten categorized hashtags
+            tags = []
+            for category_tags in hashtag_data.values():
+                if isinstance(category_tags, list):
+                    tags.extend(category_tags)
+                else:
+                    tags.append(category_tags)
         else:
-            # Fallback
-            return ["linkedin", "professional", "career", "business", "networking"]
-        
-    def generate_content_strategy(self, user_profile: UserProfile) -> Dict:
+            tags = []
+        
+        # A dict keeps first-seen order while dropping repeats
+        seen = {}
+        for tag in tags:
+            if isinstance(tag, str):
+                tag = tag.replace('#', '').strip().lower()
+                if tag:
+                    seen[tag] = None
+        return list(seen) or ["linkedin", "professional", "career", "business", "networking"]
+        
+    def generate_content_strategy(self, user_profile: UserProfile, use_cache: bool = True) -> Dict:
         """Generate a comprehensive content strategy for the user"""
-        prompt = f"""
-        Create a comprehensive LinkedIn content strategy for:
-        
-        User Profile:
-        - Name: {user_profile.full_name}
-        - Industry: {user_profile.industry}
-        - Job Title: {user_profile.job_title}
-        - Company: {user_profile.company}
-        - Skills: {', '.join(user_profile.skills)}
-        - Interests: {', '.join(user_profile.interests)}
-        - Bio: {user_profile.bio}
-        - Brand Voice: {user_profile.brand_voice}
-        - Target Audience: {user_profile.target_audience}
-        
-        IMPORTANT: Return ONLY valid JSON with this exact structure:
-        {{
-            "content_pillars": ["Theme 1", "Theme 2", "Theme 3", "Theme 4"],
-            "hashtag_strategy": ["hashtag1", "hashtag2", "hashtag3", "hashtag4", "hashtag5"],
-            "trending_topics": ["Topic 1", "Topic 2", "Topic 3"],
-            "content_ideas": ["Idea 1", "Idea 2", "Idea 3"],
-            "content_mix": {{
-                "thought_leadership": 30,
-                "industry_insights": 25,
-                "personal_experience": 25,
-                "company_updates": 20
-            }}
-        }}
-        
-        Requirements:
-        - content_pillars: 4-5 main themes for content creation
-        - hashtag_strategy: MUST be a flat array of 15-20 hashtag strings (without # symbol)
-        - trending_topics: 8-10 current industry trends
-        - content_ideas: 15-20 specific post ideas
-        - content_mix: percentage distribution as numbers
-        
-        Return ONLY the JSON, no other text.
-        """
+        prompt = _prompt_fields(
+            ("Name", user_profile.full_name),
+            ("Industry", user_profile.industry),
+            ("Job Title", user_profile.job_title),
+            ("Company", user_profile.company),
+            ("Skills", user_profile.skills),
+            ("Interests", user_profile.interests),
+            ("Bio", user_profile.bio),
+            ("Brand Voice", user_profile.brand_voice),
+            ("Target Audience", user_profile.target_audience)
+        )
         
         try:
-            response = self.model.generate_content(prompt)
-            strategy_data = self._extract_json_from_response(response.text)
+            response_text = self._cached_generate('strategy', prompt, user_profile.user_id, use_cache)
+            strategy_data = self._parse_structured(StrategySchema, response_text)
             
             # Normalize hashtag_strategy to ensure it's a flat list
             if 'hashtag_strategy' in strategy_data:
@@ -119,91 +541,63 @@ class AIService:
                              user_profile: UserProfile, 
                              content_strategy: ContentStrategy,
                              topic: str,
-                             post_type: PostType = PostType.TEXT) -> Dict:
+                             post_type: PostType = PostType.TEXT,
+                             use_cache: bool = True) -> Dict:
         """Generate a LinkedIn post based on user profile and topic"""
         
-        prompt = f"""
-        Create a LinkedIn post for:
-        
-        User: {user_profile.full_name} - {user_profile.job_title} at {user_profile.company}
-        Industry: {user_profile.industry}
-        Brand Voice: {user_profile.brand_voice}
-        Content Pillars: {', '.join(content_strategy.content_pillars)}
-        Available Hashtags: {', '.join(content_strategy.hashtag_strategy[:15])}
-        
-        Topic: {topic}
-        Post Type: {post_type.value}
-        
-        Requirements:
-        - Maximum {settings.MAX_POST_LENGTH} characters
-        - Engaging and professional tone matching brand voice
-        - Include relevant call-to-action
-        - Optimize for LinkedIn algorithm
-        
-        Return ONLY valid JSON with this exact structure:
-        {{
-            "content": "The main post text here",
-            "hashtags": ["hashtag1", "hashtag2", "hashtag3"],
-            "engagement_hooks": ["hook1", "hook2"],
-            "confidence_score": 0.85
-        }}
-        
-        - content: the main post text
-        - hashtags: array of 3-5 hashtags (without # symbol)
-        - engagement_hooks: array of engagement strategies used
-        - confidence_score: number between 0 and 1
-        
-        Return ONLY the JSON, no other text.
-        """
+        context = _prompt_fields(
+            ("User", user_profile.full_name),
+            ("Job Title", user_profile.job_title),
+            ("Company", user_profile.company),
+            ("Industry", user_profile.industry),
+            ("Brand Voice", user_profile.brand_voice),
+            ("Content Pillars", content_strategy.content_pillars),
+            ("Available Hashtags", content_strategy.hashtag_strategy[:15]),
+            ("Post Type", post_type.value)
+        )
+        prompt = f"{context}\nTopic: {topic}"
         
         try:
-            response = self.model.generate_content(prompt)
-            return self._extract_json_from_response(response.text)
+            # Near-identical topics may share a post, but only when everything else in the
+            # prompt matches exactly: the namespace is keyed by a hash of that context
+            scope = f"{user_profile.user_id}:{hashlib.sha1(context.encode()).hexdigest()[:16]}"
+            response_text = self._cached_generate('post', prompt, scope, use_cache, stream=True,
+                                                  semantic_text=topic)
+            return self._parse_structured(PostSchema, response_text)
         except Exception as e:
             logger.error(f"Error generating LinkedIn post: {e}")
             return self._default_post_content(topic)
     
-    def generate_content_ideas(self, user_profile: UserProfile, count: int = 10) -> List[str]:
+    def generate_content_ideas(self, user_profile: UserProfile, count: int = 10,
+                               use_cache: bool = True) -> List[str]:
         """Generate content ideas based on user profile"""
-        prompt = f"""
-        Generate {count} specific LinkedIn content ideas for:
-        
-        - Industry: {user_profile.industry}
-        - Role: {user_profile.job_title}
-        - Skills: {', '.join(user_profile.skills)}
-        - Interests: {', '.join(user_profile.interests)}
-        
-        Return ONLY a JSON array of strings like this:
-        ["Idea 1", "Idea 2", "Idea 3", "Idea 4", "Idea 5"]
-        
-        Ideas should be:
-        - Relevant to their industry and role
-        - Engaging and shareable
-        - Mix of educational, inspirational, and personal content
-        - Suitable for LinkedIn professional audience
-        
-        Return ONLY the JSON array, no other text.
-        """
+        prompt = _prompt_fields(
+            ("Number of ideas", count),
+            ("Industry", user_profile.industry),
+            ("Role", user_profile.job_title),
+            ("Skills", user_profile.skills),
+            ("Interests", user_profile.interests)
+        )
         
         try:
-            response = self.model.generate_content(prompt)
-            content = response.text.strip()
+            content = self._cached_generate('ideas', prompt, user_profile.user_id, use_cache, stream=True).strip()
             
             # Try to extract JSON array
             try:
-                result = json.loads(content)
+                result = orjson.loads(content)
                 if isinstance(result, list):
                     return result[:count]
                 else:
                     return self._default_content_ideas()
-            except json.JSONDecodeError:
+            except orjson.JSONDecodeError:
                 # Look for JSON array in the response
-                array_pattern = r'\[(.*?)\]'
-                matches = re.findall(array_pattern, content, re.DOTALL)
-                if matches:
+                span = _find_json_span(content)
+                if span:
                     try:
-                        return json.loads(f"[{matches[0]}]")[:count]
-                    except json.JSONDecodeError:
+                        result = orjson.loads(content[span[0]:span[1]])
+                        if isinstance(result, list):
+                            return result[:count]
+                    except orjson.JSONDecodeError:
                         pass
                 
                 # If JSON parsing fails, extract ideas manually
@@ -225,71 +619,40 @@ class AIService:
         """Analyze post performance and provide insights"""
         engagement_rate = post.engagement_rate
         
-        prompt = f"""
-        Analyze this LinkedIn post performance:
-        
-        Post Content: {post.content[:500]}...
-        Hashtags: {', '.join(post.hashtags)}
-        Metrics:
-        - Likes: {post.likes_count}
-        - Comments: {post.comments_count}
-        - Shares: {post.shares_count}
-        - Views: {post.views_count}
-        - Engagement Rate: {engagement_rate}%
-        
-        Return ONLY valid JSON with this exact structure:
-        {{
-            "performance_rating": "excellent",
-            "key_insights": ["Insight 1", "Insight 2"],
-            "improvement_suggestions": ["Suggestion 1", "Suggestion 2"],
-            "content_score": 85
-        }}
-        
-        - performance_rating: "excellent", "good", "average", or "poor"
-        - key_insights: array of insights about what worked/didn't work
-        - improvement_suggestions: array of specific suggestions
-        - content_score: number between 0-100
-        
-        Return ONLY the JSON, no other text.
-        """
+        prompt = _prompt_fields(
+            ("Post Content", post.content[:500]),
+            ("Hashtags", post.hashtags)
+        ) + (
+            f"\nLikes: {post.likes_count}, Comments: {post.comments_count}, "
+            f"Shares: {post.shares_count}, Views: {post.views_count}, "
+            f"Engagement Rate: {engagement_rate}%"
+        )
         
         try:
-            response = self.model.generate_content(prompt)
-            return self._extract_json_from_response(response.text)
+            # Exact matches only: re-analysing a post after its metrics move differs only in numbers
+            response_text = self._cached_generate('analysis', prompt, post.user_id)
+            return self._parse_structured(AnalysisSchema, response_text)
         except Exception as e:
             logger.error(f"Error analyzing post performance: {e}")
             return self._default_performance_analysis()
     
-    def optimize_hashtags(self, content: str, industry: str) -> List[str]:
+    def optimize_hashtags(self, content: str, industry: str, user_id: str = '') -> List[str]:
         """Generate optimized hashtags for content"""
-        prompt = f"""
-        Generate 10 optimized LinkedIn hashtags for this content in {industry} industry:
-        
-        Content: {content[:500]}
-        
-        Return ONLY a JSON array like this:
-        ["hashtag1", "hashtag2", "hashtag3", "hashtag4", "hashtag5"]
-        
-        Requirements:
-        - Mix of popular and niche hashtags
-        - Relevant to content and industry
-        - Good balance of reach and engagement potential
-        - WITHOUT # symbol
-        
-        Return ONLY the JSON array, no other text.
-        """
+        prompt = _prompt_fields(
+            ("Industry", industry),
+            ("Content", content[:500])
+        )
         
         try:
-            response = self.model.generate_content(prompt)
-            content_response = response.text.strip()
+            content_response = self._cached_generate('hashtags', prompt, user_id).strip()
             
             try:
-                result = json.loads(content_response)
+                result = orjson.loads(content_response)
                 if isinstance(result, list):
                     return [tag.replace('#', '') for tag in result[:10]]
                 else:
                     return self._default_hashtags(industry)
-            except json.JSONDecodeError:
+            except orjson.JSONDecodeError:
                 # Extract hashtags manually if JSON parsing fails
                 hashtags = []
                 lines = content_response.split('\n')
@@ -297,8 +660,7 @@ class AIService:
                     line = line.strip()
                     if '#' in line:
                         # Extract hashtags from line
-                        tags = re.findall(r'#?(\w+)', line)
-                        hashtags.extend([tag for tag in tags if len(tag) > 2])
+                        hashtags.extend(_HASHTAG_RE.findall(line))
                     elif line and (line.startswith('-') or line.startswith('•') or line.startswith('"')):
                         tag = line.lstrip('-•"').rstrip('"').strip().replace('#', '')
                         if tag and len(tag) > 2:
@@ -309,88 +671,43 @@ class AIService:
             logger.error(f"Error optimizing hashtags: {e}")
             return self._default_hashtags(industry)
     
+    # Async variants run the blocking calls in worker threads: the SDK's async
+    # gRPC client binds to the first event loop it sees, and Streamlit callers
+    # start a fresh loop with asyncio.run on every invocation.
+    async def agenerate_content_strategy(self, user_profile: UserProfile, use_cache: bool = True) -> Dict:
+        return await asyncio.to_thread(self.generate_content_strategy, user_profile, use_cache)
+    
+    async def agenerate_content_ideas(self, user_profile: UserProfile, count: int = 10,
+                                      use_cache: bool = True) -> List[str]:
+        return await asyncio.to_thread(self.generate_content_ideas, user_profile, count, use_cache)
+    
+    async def generate_user_bundle(self, user_profile: UserProfile, idea_count: int = 10) -> Dict:
+        """Generate strategy and content ideas for a user concurrently"""
+        strategy, ideas = await asyncio.gather(
+            self.agenerate_content_strategy(user_profile),
+            self.agenerate_content_ideas(user_profile, idea_count)
+        )
+        return {'strategy': strategy, 'ideas': ideas}
+    
     def _default_hashtags(self, industry: str) -> List[str]:
         """Default hashtags based on industry"""
-        base_tags = ["linkedin", "professional", "career", "networking"]
         industry_tag = industry.lower().replace(" ", "").replace("-", "")
-        return base_tags + [industry_tag, "business", "growth"]
+        return [*_DEFAULT_BASE_TAGS, industry_tag, "business", "growth"]
     
     def _default_content_strategy(self) -> Dict:
         """Default content strategy fallback"""
-        return {
-            "content_pillars": [
-                "Industry Insights", 
-                "Professional Growth", 
-                "Leadership", 
-                "Innovation", 
-                "Career Development"
-            ],
-            "hashtag_strategy": [
-                "linkedin", "professional", "career", "leadership", "growth", 
-                "industry", "business", "networking", "success", "motivation",
-                "innovation", "development", "skills", "workplace", "team"
-            ],
-            "trending_topics": [
-                "AI trends", "Remote work", "Digital transformation", 
-                "Industry innovation", "Professional development",
-                "Leadership skills", "Career growth", "Workplace culture"
-            ],
-            "content_ideas": [
-                "Share a professional achievement",
-                "Industry prediction for next year", 
-                "Career advice for newcomers",
-                "Lessons learned from recent project",
-                "Thoughts on industry trends",
-                "Team collaboration success story",
-                "Professional development tips",
-                "Industry best practices"
-            ],
-            "content_mix": {
-                "thought_leadership": 30,
-                "industry_insights": 25,
-                "personal_experience": 25,
-                "company_updates": 20
-            }
-        }
+        return _thaw(_DEFAULT_STRATEGY)
     
     def _default_post_content(self, topic: str) -> Dict:
         """Default post content fallback"""
-        return {
-            "content": f"Sharing my thoughts on {topic}. This is an important topic in our industry, and I believe it's worth discussing. What's your perspective on this? I'd love to hear your thoughts in the comments.",
-            "hashtags": ["linkedin", "professional", "networking", "industry", "discussion"],
-            "engagement_hooks": ["question", "call-to-action", "personal-opinion"],
-            "confidence_score": 0.6
-        }
+        post = _thaw(_DEFAULT_POST)
+        post["content"] = post["content"].format(topic=topic)
+        return post
     
     def _default_content_ideas(self) -> List[str]:
         """Default content ideas fallback"""
-        return [
-            "Share a recent professional achievement",
-            "Discuss current industry trends and predictions",
-            "Provide career advice for newcomers in your field",
-            "Share lessons learned from recent failures or challenges",
-            "Highlight successful team collaboration",
-            "Discuss emerging technologies in your industry",
-            "Share insights from recent professional development",
-            "Discuss work-life balance strategies",
-            "Share thoughts on leadership and management",
-            "Discuss industry best practices"
-        ]
+        return list(_DEFAULT_IDEAS)
     
     def _default_performance_analysis(self) -> Dict:
         """Default performance analysis fallback"""
-        return {
-            "performance_rating": "average",
-            "key_insights": [
-                "Standard engagement levels for this type of content",
-                "Post timing may have affected reach",
-                "Content resonated with core audience"
-            ],
-            "improvement_suggestions": [
-                "Add more engaging visuals or media",
-                "Include a clear call-to-action",
-                "Post during peak engagement hours",
-                "Use more relevant hashtags"
-            ],
-            "content_score": 60
-        }
+        return _thaw(_DEFAULT_ANALYSIS)
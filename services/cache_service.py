@@ -1,25 +1,50 @@
 import redis
-import json
+import orjson
 import logging
-from typing import Any, Optional
+import zlib
+from typing import Any, List, Optional
 from config.settings import settings
 
 logger = logging.getLogger(__name__)
 
+# Payloads larger than this are zlib-compressed before being stored. The marker
+# starts with 0xFF, which never begins UTF-8 text, so it can't collide with a value.
+COMPRESSION_THRESHOLD = 512
+_COMPRESSED_PREFIX = b"\xffZ"
+
+def _encode(value: Any) -> bytes:
+    """Serialize a value for Redis, compressing large payloads"""
+    data = value.encode() if isinstance(value, str) else orjson.dumps(value)
+    if len(data) > COMPRESSION_THRESHOLD:
+        data = _COMPRESSED_PREFIX + zlib.compress(data, 3)
+    return data
+
+def _decode(data: Optional[bytes]) -> Optional[Any]:
+    """Inverse of _encode; non-JSON values come back as strings"""
+    if not data:
+        return None
+    if data[:2] == _COMPRESSED_PREFIX:
+        data = zlib.decompress(data[2:])
+    try:
+        return orjson.loads(data)
+    except orjson.JSONDecodeError:
+        return data.decode()
+
 class CacheService:
     def __init__(self):
-        self.redis_client = redis.Redis(
+        # Explicit pool so concurrent Streamlit sessions don't queue on one socket
+        self._pool = redis.ConnectionPool(
             host=settings.REDIS_HOST,
             port=settings.REDIS_PORT,
             db=settings.REDIS_DB,
-            decode_responses=True
+            max_connections=50
         )
+        self.redis_client = redis.Redis(connection_pool=self._pool)
     
     def set(self, key: str, value: Any, expiration: int = 3600) -> bool:
         """Set a value in cache with expiration (default 1 hour)"""
         try:
-            serialized_value = json.dumps(value) if not isinstance(value, str) else value
-            return self.redis_client.setex(key, expiration, serialized_value)
+            return self.redis_client.setex(key, expiration, _encode(value))
         except Exception as e:
             logger.error(f"Error setting cache key {key}: {e}")
             return False
@@ -27,25 +52,51 @@ class CacheService:
     def get(self, key: str) -> Optional[Any]:
         """Get a value from cache"""
         try:
-            value = self.redis_client.get(key)
-            if value:
-                try:
-                    return json.loads(value)
-                except json.JSONDecodeError:
-                    return value
-            return None
+            return _decode(self.redis_client.get(key))
         except Exception as e:
             logger.error(f"Error getting cache key {key}: {e}")
             return None
     
-    def delete(self, key: str) -> bool:
-        """Delete a key from cache"""
+    def delete(self, *keys: str) -> bool:
+        """Delete one or more keys from cache in a single DEL command"""
+        try:
+            return bool(self.redis_client.delete(*keys))
+        except Exception as e:
+            logger.error(f"Error deleting cache keys {keys}: {e}")
+            return False
+    
+    def get_many(self, keys: List[str]) -> List[Optional[Any]]:
+        """Get several values from cache in a single MGET"""
         try:
-            return bool(self.redis_client.delete(key))
+            values = self.redis_client.mget(keys)
         except Exception as e:
-            logger.error(f"Error deleting cache key {key}: {e}")
+            logger.error(f"Error getting cache keys {keys}: {e}")
+            return [None] * len(keys)
+        
+        return [_decode(value) for value in values]
+    
+    def push_recent(self, key: str, value: str, max_length: int, expiration: int = 3600) -> bool:
+        """Prepend a value to a capped list of recent entries"""
+        try:
+            with self.redis_client.pipeline(transaction=False) as pipe:
+                pipe.lrem(key, 0, value)
+                pipe.lpush(key, value)
+                pipe.ltrim(key, 0, max_length - 1)
+                pipe.expire(key, expiration)
+                pipe.execute()
+            return True
+        except Exception as e:
+            logger.error(f"Error pushing to cache list {key}: {e}")
             return False
     
+    def get_recent(self, key: str) -> List[str]:
+        """Get the entries of a recent-entries list, newest first"""
+        try:
+            return [value.decode() for value in self.redis_client.lrange(key, 0, -1)]
+        except Exception as e:
+            logger.error(f"Error reading cache list {key}: {e}")
+            return []
+    
     def exists(self, key: str) -> bool:
         """Check if key exists in cache"""
         try:
@@ -77,3 +128,11 @@ class CacheService:
     def get_content_ideas(self, user_id: str) -> Optional[list]:
         """Get cached content ideas for user"""
         return self.get(f"content_ideas:{user_id}")
+    
+    def cache_linkedin_profile(self, user_id: str, profile: dict, expiration: int = 3600):
+        """Cache LinkedIn profile for user (1 hour default)"""
+        return self.set(f"profile:{user_id}", profile, expiration)
+    
+    def get_linkedin_profile(self, user_id: str) -> Optional[dict]:
+        """Get cached LinkedIn profile for user"""
+        return self.get(f"profile:{user_id}")
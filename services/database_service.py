@@ -1,16 +1,183 @@
-from pymongo import MongoClient
-from typing import List, Optional, Dict, Any
+from pymongo import IndexModel, MongoClient
+from pymongo.errors import OperationFailure, PyMongoError
+from typing import Iterator, List, Optional, Dict, Any, Union
 from datetime import datetime
+from copy import copy
+from functools import lru_cache, wraps
 import logging
+import threading
+import time
+from pydantic import BaseModel
 from config.settings import settings
 from models.user import UserProfile, ContentStrategy
-from models.content import LinkedInPost, ContentCalendar
+from models.content import LinkedInPost, ContentCalendar, PostType, PostStatus
 
 logger = logging.getLogger(__name__)
 
+# One client (and so one connection pool) per process, shared by every DatabaseService
+_client = None
+_client_lock = threading.Lock()
+# Indexes only need ensuring once per process, not per DatabaseService
+_indexes_ready = False
+
+def _get_client() -> MongoClient:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = MongoClient(
+                    settings.MONGODB_URL,
+                    maxPoolSize=50,
+                    minPoolSize=10,
+                    maxIdleTimeMS=30000,
+                    waitQueueTimeoutMS=2500,
+                    serverSelectionTimeoutMS=5000,
+                    retryWrites=True,
+                    retryReads=True,
+                    compressors="zlib"
+                )
+    return _client
+
+# Index key patterns for the hot post queries, shared by index creation and hints
+_POSTS_BY_USER_INDEX = [("user_id", 1), ("created_at", -1)]
+_SCHEDULED_POSTS_INDEX = [("user_id", 1), ("status", 1), ("scheduled_time", 1)]
+
+# Mongo's _id never reaches the models or raw callers, so don't fetch it
+_NO_ID = {"_id": 0}
+
+@lru_cache(maxsize=None)
+def _projection(fields: Optional[tuple]) -> Dict[str, int]:
+    """Projection including only the given fields (everything when None), built once per field set"""
+    if fields is None:
+        return _NO_ID
+    return {"_id": 0, **{field: 1 for field in fields}}
+
+# Per-user post metrics, as a $group stage and as the result when there are no posts
+_POST_STATS_GROUP = {
+    "_id": None,
+    "total_posts": {"$sum": 1},
+    "total_likes": {"$sum": "$likes_count"},
+    "total_comments": {"$sum": "$comments_count"},
+    "total_shares": {"$sum": "$shares_count"},
+    "avg_engagement": {"$avg": "$engagement_rate"}
+}
+_EMPTY_POST_STATS = {
+    "total_posts": 0,
+    "total_likes": 0,
+    "total_comments": 0,
+    "total_shares": 0,
+    "avg_engagement": 0.0
+}
+
+# Inside a $lookup sub-pipeline, match documents belonging to the outer user
+_MATCH_LOOKUP_USER = {"$expr": {"$eq": ["$user_id", "$$uid"]}}
+
+_HASH_TBL = str.maketrans('', '', '#')
+
+def _normalize_strategy(strategy_data: Dict[str, Any]) -> bool:
+    """Ensure hashtag_strategy is a flat list in a stored strategy document; True if it was converted"""
+    hashtag_strategy = strategy_data.get('hashtag_strategy')
+    if not isinstance(hashtag_strategy, dict):
+        return False
+    # Legacy category -> tags dict: flatten it and drop the '#' prefixes
+    strategy_data['hashtag_strategy'] = [
+        tag.translate(_HASH_TBL)
+        for tags in hashtag_strategy.values() if isinstance(tags, list)
+        for tag in tags
+    ]
+    return True
+
+def _load_model(model_cls: type, doc: Dict[str, Any], projected: bool = False):
+    """Build a model from a stored document without re-validating it. Its set fields start
+    empty, so assignments made afterwards are exactly what a later save writes."""
+    model = model_cls.model_construct(_fields_set=set(), **doc)
+    model._loaded = "projection" if projected else "full"
+    return model
+
+def _save_model(collection, filter_: Dict[str, Any], model: BaseModel):
+    """Write a model back.
+
+    A model built in the app replaces the stored document, so fields left at their
+    defaults overwrite stale stored values. A model read from the database only $sets
+    the fields assigned since, and the server stamps updated_at. Saving a model read
+    with a projection would lose the fields it never fetched, so it is refused.
+    """
+    if model._loaded is None:
+        collection.replace_one(filter_, model.model_dump(), upsert=True)
+        return
+    if model._loaded == "projection":
+        raise ValueError(f"Cannot save a {type(model).__name__} that was read with a projection")
+    update = {"$currentDate": {"updated_at": True}}
+    changed = model.model_fields_set - {"updated_at"}
+    if changed:
+        update["$set"] = model.model_dump(include=changed)
+    collection.update_one(filter_, update)
+
+# Users and strategies are read on almost every page and rarely written, so recently read
+# documents are kept in-process briefly: (kind, user_id) -> (monotonic expiry, document)
+RECORD_CACHE_TTL = 60
+RECORD_CACHE_MAX = 10_000
+_record_cache: Dict[tuple, tuple] = {}
+_record_cache_lock = threading.Lock()
+
+def _cache_get(kind: str, user_id: str) -> Optional[Dict[str, Any]]:
+    with _record_cache_lock:
+        entry = _record_cache.get((kind, user_id))
+    if entry and entry[0] > time.monotonic():
+        # Shallow copy so callers can't add or drop keys on the cached document
+        return dict(entry[1])
+    return None
+
+def _cache_put(kind: str, user_id: str, doc: Dict[str, Any]):
+    global _record_cache
+    with _record_cache_lock:
+        if len(_record_cache) >= RECORD_CACHE_MAX:
+            now = time.monotonic()
+            _record_cache = {k: v for k, v in _record_cache.items() if v[0] > now}
+            if len(_record_cache) >= RECORD_CACHE_MAX:
+                _record_cache.pop(next(iter(_record_cache)))
+        _record_cache[(kind, user_id)] = (time.monotonic() + RECORD_CACHE_TTL, dict(doc))
+
+def _cache_drop(user_id: str, *kinds: str):
+    with _record_cache_lock:
+        for kind in kinds:
+            _record_cache.pop((kind, user_id), None)
+
+def _db_safe(action: str, default: Any):
+    """Log driver errors from a DatabaseService method and return `default` instead;
+    transient failures have already been retried by the driver (retryReads/retryWrites)"""
+    def decorator(method):
+        @wraps(method)
+        def wrapper(*args, **kwargs):
+            try:
+                return method(*args, **kwargs)
+            except PyMongoError as e:
+                logger.error(f"Error {action}: {e}")
+                return copy(default)
+        return wrapper
+    return decorator
+
+def _construct_post(post_data: Dict[str, Any], projected: bool = False) -> Optional[LinkedInPost]:
+    """Build a post from a stored document without re-validating it; None if it is malformed"""
+    # model_construct skips coercion, so restore the enums callers rely on
+    try:
+        post_data["post_type"] = PostType(post_data.get("post_type", PostType.TEXT))
+        post_data["status"] = PostStatus(post_data.get("status", PostStatus.DRAFT))
+    except ValueError as e:
+        logger.error(f"Skipping malformed post {post_data.get('post_id')}: {e}")
+        return None
+    return _load_model(LinkedInPost, post_data, projected)
+
+def _construct_posts(posts_data, projected: bool = False) -> Iterator[LinkedInPost]:
+    """Build posts from stored documents, leaving out malformed ones"""
+    for post_data in posts_data:
+        post = _construct_post(post_data, projected)
+        if post is not None:
+            yield post
+
 class DatabaseService:
     def __init__(self):
-        self.client = MongoClient(settings.MONGODB_URL)
+        self.client = _get_client()
         self.db = self.client[settings.DATABASE_NAME]
         self.users = self.db.users
         self.content_strategies = self.db.content_strategies
@@ -21,153 +188,238 @@ class DatabaseService:
         self._create_indexes()
     
     def _create_indexes(self):
-        """Create database indexes for better performance"""
-        self.users.create_index("user_id", unique=True)
-        self.users.create_index("email", unique=True)
-        self.posts.create_index("user_id")
-        self.posts.create_index("scheduled_time")
-        self.posts.create_index("published_time")
-        self.content_strategies.create_index("user_id", unique=True)
-        self.calendars.create_index([("user_id", 1), ("month", 1), ("year", 1)], unique=True)
+        """Create database indexes for better performance, one command per collection"""
+        global _indexes_ready
+        if _indexes_ready:
+            return
+        with _client_lock:
+            if _indexes_ready:
+                return
+            self.users.create_indexes([
+                IndexModel("user_id", unique=True),
+                IndexModel("email", unique=True)
+            ])
+            self.posts.create_indexes([
+                IndexModel("published_time"),
+                # Serve get_user_posts and get_scheduled_posts straight from index order
+                IndexModel(_POSTS_BY_USER_INDEX),
+                IndexModel(_SCHEDULED_POSTS_INDEX, partialFilterExpression={"status": "scheduled"})
+            ])
+            # Superseded by the compound indexes above (user_id is their prefix)
+            for index_name in ("user_id_1", "scheduled_time_1"):
+                try:
+                    self.posts.drop_index(index_name)
+                except OperationFailure:
+                    pass
+            self.content_strategies.create_indexes([IndexModel("user_id", unique=True)])
+            self.calendars.create_indexes([
+                IndexModel([("user_id", 1), ("month", 1), ("year", 1)], unique=True)
+            ])
+            _indexes_ready = True
     
     # User operations
+    @_db_safe("creating user", False)
     def create_user(self, user_profile: UserProfile) -> bool:
-        try:
-            result = self.users.insert_one(user_profile.dict())
-            return result.inserted_id is not None
-        except Exception as e:
-            logger.error(f"Error creating user: {e}")
-            return False
+        result = self.users.insert_one(user_profile.model_dump())
+        _cache_drop(user_profile.user_id, "user")
+        return result.inserted_id is not None
     
-    def get_user(self, user_id: str) -> Optional[UserProfile]:
-        try:
-            user_data = self.users.find_one({"user_id": user_id})
-            if user_data:
-                return UserProfile(**user_data)
-            return None
-        except Exception as e:
-            logger.error(f"Error getting user: {e}")
-            return None
+    @_db_safe("getting user", None)
+    def get_user(self, user_id: str, raw: bool = False,
+                 fields: Optional[tuple] = None) -> Optional[Union[UserProfile, Dict[str, Any]]]:
+        """Get a user; `fields` limits which fields are fetched, the rest take model defaults"""
+        user_data = _cache_get("user", user_id)
+        if user_data is not None:
+            if fields is not None:
+                user_data = {field: user_data[field] for field in fields if field in user_data}
+        else:
+            user_data = self.users.find_one({"user_id": user_id}, _projection(fields))
+            if user_data and fields is None:
+                _cache_put("user", user_id, user_data)
+        if user_data:
+            return user_data if raw else UserProfile.model_construct(**user_data)
+        return None
     
+    @_db_safe("updating user", False)
     def update_user(self, user_id: str, update_data: Dict[str, Any]) -> bool:
-        try:
-            update_data["updated_at"] = datetime.utcnow()
-            result = self.users.update_one(
-                {"user_id": user_id},
-                {"$set": update_data}
-            )
-            return result.modified_count > 0
-        except Exception as e:
-            logger.error(f"Error updating user: {e}")
-            return False
+        # Stamped by the server, so app nodes with skewed clocks agree
+        update_data.pop("updated_at", None)
+        update = {"$currentDate": {"updated_at": True}}
+        if update_data:
+            update["$set"] = update_data
+        result = self.users.update_one({"user_id": user_id}, update)
+        _cache_drop(user_id, "user")
+        return result.modified_count > 0
+    
+    @_db_safe("deleting user data", False)
+    def delete_user_data(self, user_id: str) -> bool:
+        """Delete a user together with their posts, strategy and calendars"""
+        self.users.delete_one({"user_id": user_id})
+        self.posts.delete_many({"user_id": user_id})
+        self.content_strategies.delete_one({"user_id": user_id})
+        self.calendars.delete_many({"user_id": user_id})
+        _cache_drop(user_id, "user", "strategy")
+        return True
+    
+    @_db_safe("getting user dashboard", None)
+    def get_user_dashboard(self, user_id: str, post_limit: int = 5,
+                           series_limit: int = 100) -> Optional[Dict[str, Any]]:
+        """Fetch a user's recent posts, post stats, scheduled post count and
+        engagement series in one aggregation round trip; None if the user doesn't exist"""
+        def lookup(collection: str, pipeline: List[Dict[str, Any]], name: str) -> Dict[str, Any]:
+            return {"$lookup": {
+                "from": collection,
+                "let": {"uid": "$user_id"},
+                "pipeline": pipeline,
+                "as": name
+            }}
+        
+        result = list(self.users.aggregate([
+            {"$match": {"user_id": user_id}},
+            {"$project": {"_id": 0, "user_id": 1}},
+            lookup("posts", [
+                {"$match": _MATCH_LOOKUP_USER},
+                {"$sort": {"created_at": -1}},
+                {"$limit": post_limit},
+                {"$project": {"_id": 0}}
+            ], "recent_posts"),
+            lookup("posts", [
+                {"$match": _MATCH_LOOKUP_USER},
+                {"$group": _POST_STATS_GROUP},
+                {"$project": {"_id": 0}}
+            ], "stats"),
+            lookup("posts", [
+                {"$match": {"status": "scheduled", **_MATCH_LOOKUP_USER}},
+                {"$count": "count"}
+            ], "scheduled"),
+            lookup("posts", [
+                {"$match": _MATCH_LOOKUP_USER},
+                {"$sort": {"created_at": -1}},
+                {"$limit": series_limit},
+                {"$project": {"_id": 0, "created_at": 1, "engagement_rate": 1}}
+            ], "engagement_series")
+        ]))
+        if not result:
+            return None
+        
+        dashboard = result[0]
+        stats = dict(_EMPTY_POST_STATS)
+        for group in dashboard["stats"]:
+            stats.update(group)
+        scheduled = dashboard["scheduled"]
+        
+        return {
+            "recent_posts": list(_construct_posts(dashboard["recent_posts"])),
+            "stats": stats,
+            "scheduled_count": scheduled[0]["count"] if scheduled else 0,
+            "engagement_series": dashboard["engagement_series"]
+        }
     
     # Content strategy operations
+    @_db_safe("saving content strategy", False)
     def save_content_strategy(self, strategy: ContentStrategy) -> bool:
-        try:
-            result = self.content_strategies.replace_one(
-                {"user_id": strategy.user_id},
-                strategy.dict(),
-                upsert=True
-            )
-            return True
-        except Exception as e:
-            logger.error(f"Error saving content strategy: {e}")
-            return False
+        _save_model(self.content_strategies, {"user_id": strategy.user_id}, strategy)
+        _cache_drop(strategy.user_id, "strategy")
+        return True
     
-    def get_content_strategy(self, user_id: str) -> Optional[ContentStrategy]:
-        try:
-            strategy_data = self.content_strategies.find_one({"user_id": user_id})
-            if strategy_data:
-                # Ensure hashtag_strategy is a list
-                if 'hashtag_strategy' in strategy_data:
-                    if isinstance(strategy_data['hashtag_strategy'], dict):
-                    # Convert dict to flat list
-                        hashtags = []
-                        for category, tags in strategy_data['hashtag_strategy'].items():
-                            if isinstance(tags, list):
-                                hashtags.extend([tag.replace('#', '') for tag in tags])
-                        strategy_data['hashtag_strategy'] = hashtags
-            
-                return ContentStrategy(**strategy_data)
-            return None
-        except Exception as e:
-            logger.error(f"Error getting content strategy: {e}")
-            return None
+    @_db_safe("getting content strategy", None)
+    def get_content_strategy(self, user_id: str,
+                             raw: bool = False) -> Optional[Union[ContentStrategy, Dict[str, Any]]]:
+        strategy_data = _cache_get("strategy", user_id)
+        if strategy_data is None:
+            strategy_data = self.content_strategies.find_one({"user_id": user_id}, _NO_ID)
+            if not strategy_data:
+                return None
+            if _normalize_strategy(strategy_data):
+                # Persist the flattened list so later reads skip the conversion
+                self.content_strategies.update_one(
+                    {"user_id": user_id},
+                    {"$set": {"hashtag_strategy": strategy_data["hashtag_strategy"]}}
+                )
+            _cache_put("strategy", user_id, strategy_data)
+        return strategy_data if raw else _load_model(ContentStrategy, strategy_data)
 
     
     # Post operations
+    @_db_safe("saving post", False)
     def save_post(self, post: LinkedInPost) -> bool:
-        try:
-            result = self.posts.replace_one(
-                {"post_id": post.post_id},
-                post.dict(),
-                upsert=True
-            )
-            return True
-        except Exception as e:
-            logger.error(f"Error saving post: {e}")
-            return False
+        _save_model(self.posts, {"post_id": post.post_id}, post)
+        return True
     
-    def get_post(self, post_id: str) -> Optional[LinkedInPost]:
-        try:
-            post_data = self.posts.find_one({"post_id": post_id})
-            if post_data:
-                return LinkedInPost(**post_data)
-            return None
-        except Exception as e:
-            logger.error(f"Error getting post: {e}")
-            return None
+    @_db_safe("getting post", None)
+    def get_post(self, post_id: str, raw: bool = False) -> Optional[Union[LinkedInPost, Dict[str, Any]]]:
+        post_data = self.posts.find_one({"post_id": post_id}, _NO_ID)
+        if post_data:
+            return post_data if raw else _construct_post(post_data)
+        return None
     
-    def get_user_posts(self, user_id: str, limit: int = 50) -> List[LinkedInPost]:
-        try:
-            posts_data = self.posts.find(
-                {"user_id": user_id}
-            ).sort("created_at", -1).limit(limit)
-            
-            return [LinkedInPost(**post) for post in posts_data]
-        except Exception as e:
-            logger.error(f"Error getting user posts: {e}")
-            return []
+    @_db_safe("getting user posts", [])
+    def get_user_posts(self, user_id: str, limit: int = 50, raw: bool = False,
+                       fields: Optional[tuple] = None) -> List[Union[LinkedInPost, Dict[str, Any]]]:
+        """Get a user's most recent posts; `fields` limits which fields are fetched"""
+        posts_data = self.posts.find(
+            {"user_id": user_id}, _projection(fields)
+        ).sort("created_at", -1).limit(limit).batch_size(limit).hint(_POSTS_BY_USER_INDEX)
+        
+        if raw:
+            return list(posts_data)
+        return list(_construct_posts(posts_data, projected=fields is not None))
     
-    def get_scheduled_posts(self, user_id: str) -> List[LinkedInPost]:
-        try:
-            posts_data = self.posts.find({
-                "user_id": user_id,
-                "status": "scheduled"
-            }).sort("scheduled_time", 1)
-            
-            return [LinkedInPost(**post) for post in posts_data]
-        except Exception as e:
-            logger.error(f"Error getting scheduled posts: {e}")
-            return []
+    @_db_safe("aggregating user post stats", _EMPTY_POST_STATS)
+    def get_user_post_stats(self, user_id: str) -> Dict[str, Any]:
+        """Aggregate post metrics for a user in a single server-side pass"""
+        stats = dict(_EMPTY_POST_STATS)
+        result = list(self.posts.aggregate([
+            {"$match": {"user_id": user_id}},
+            {"$group": _POST_STATS_GROUP}
+        ]))
+        if result:
+            result[0].pop("_id", None)
+            stats.update(result[0])
+        return stats
+    
+    @_db_safe("getting scheduled posts", [])
+    def get_scheduled_posts(self, user_id: str,
+                            start: Optional[datetime] = None,
+                            end: Optional[datetime] = None,
+                            raw: bool = False) -> List[Union[LinkedInPost, Dict[str, Any]]]:
+        """Get scheduled posts, optionally limited to start <= scheduled_time < end"""
+        query = {
+            "user_id": user_id,
+            "status": "scheduled"
+        }
+        time_range = {}
+        if start:
+            time_range["$gte"] = start
+        if end:
+            time_range["$lt"] = end
+        if time_range:
+            query["scheduled_time"] = time_range
+        
+        posts_data = self.posts.find(query, _NO_ID).sort("scheduled_time", 1).hint(_SCHEDULED_POSTS_INDEX)
+        
+        if raw:
+            return list(posts_data)
+        return list(_construct_posts(posts_data))
     
     # Calendar operations
+    @_db_safe("saving calendar", False)
     def save_calendar(self, calendar: ContentCalendar) -> bool:
-        try:
-            result = self.calendars.replace_one(
-                {
-                    "user_id": calendar.user_id,
-                    "month": calendar.month,
-                    "year": calendar.year
-                },
-                calendar.dict(),
-                upsert=True
-            )
-            return True
-        except Exception as e:
-            logger.error(f"Error saving calendar: {e}")
-            return False
+        _save_model(self.calendars, {
+            "user_id": calendar.user_id,
+            "month": calendar.month,
+            "year": calendar.year
+        }, calendar)
+        return True
     
-    def get_calendar(self, user_id: str, month: int, year: int) -> Optional[ContentCalendar]:
-        try:
-            calendar_data = self.calendars.find_one({
-                "user_id": user_id,
-                "month": month,
-                "year": year
-            })
-            if calendar_data:
-                return ContentCalendar(**calendar_data)
-            return None
-        except Exception as e:
-            logger.error(f"Error getting calendar: {e}")
-            return None
+    @_db_safe("getting calendar", None)
+    def get_calendar(self, user_id: str, month: int, year: int,
+                     raw: bool = False) -> Optional[Union[ContentCalendar, Dict[str, Any]]]:
+        calendar_data = self.calendars.find_one({
+            "user_id": user_id,
+            "month": month,
+            "year": year
+        }, _NO_ID)
+        if calendar_data:
+            return calendar_data if raw else _load_model(ContentCalendar, calendar_data)
+        return None
@@ -1,50 +1,90 @@
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import hashlib
 import logging
+import threading
+import time
 import urllib.parse
-from typing import Dict, Optional, List
+from typing import Dict, Optional, List, Tuple
 from datetime import datetime
+from functools import lru_cache
 from config.settings import settings
 
 logger = logging.getLogger(__name__)
 
+# (connect, read) seconds for every LinkedIn call, so a stalled socket can't hang a page
+REQUEST_TIMEOUT = (3.05, 10)
+
+# A member's id never changes for a token, so remember it instead of hitting /userinfo per publish
+USER_ID_TTL = 3600
+USER_ID_CACHE_MAX = 10_000
+
+@lru_cache(maxsize=1024)
+def _render_hashtags(tags: Tuple[str, ...]) -> str:
+    """Hashtag suffix appended to a post; strategies reuse the same tag sets, so memoize"""
+    return "\n\n#" + " #".join(tags)
+
 class LinkedInService:
+    # Endpoints and static headers, built once instead of on every call
+    REDIRECT_URI = "http://localhost:8502/linkedin/callback"
+    _USERINFO_URL = "https://api.linkedin.com/v2/userinfo"
+    _LEGACY_PROFILE_URL = "https://api.linkedin.com/v2/people/~:(id,firstName,lastName)"
+    _UGC_URL = "https://api.linkedin.com/v2/ugcPosts"
+    _TOKEN_HEADERS = {"Content-Type": "application/x-www-form-urlencoded"}
+    _PUBLISH_HEADERS = {"Content-Type": "application/json", "X-Restli-Protocol-Version": "2.0.0"}
+    
     def __init__(self):
         self.base_url = "https://api.linkedin.com/v2"
         self.auth_url = "https://www.linkedin.com/oauth/v2/authorization"
         self.token_url = "https://www.linkedin.com/oauth/v2/accessToken"
-    
-    def get_authorization_url(self, state: str = "random_state") -> str:
-        """Generate LinkedIn OAuth authorization URL with minimal scopes"""
-        params = {
+        
+        # Shared session so calls reuse pooled keep-alive connections instead of
+        # paying a fresh TCP + TLS handshake each time. Retry's default method
+        # list leaves POSTs (token exchange, publishing) un-retried. Once retries run out
+        # the last response is returned rather than raised, so the status-code handling
+        # below (e.g. the legacy profile fallback) still runs.
+        retries = Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504],
+                        raise_on_status=False)
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=retries))
+        
+        # Everything but the state is static, so encode it once
+        self._auth_query = urllib.parse.urlencode({
             "response_type": "code",
             "client_id": settings.LINKEDIN_CLIENT_ID,
-            "redirect_uri": "http://localhost:8502/linkedin/callback",
+            "redirect_uri": self.REDIRECT_URI,
             # Using OpenID Connect scope instead
-            "scope": "openid profile w_member_social",
-            "state": state
-        }
+            "scope": "openid profile w_member_social"
+        })
         
-        query_string = urllib.parse.urlencode(params)
-        return f"{self.auth_url}?{query_string}"
+        # sha256(token)[:16] -> (monotonic expiry, member id); raw tokens are never kept as keys
+        self._uid_cache: Dict[str, tuple] = {}
+        self._uid_lock = threading.Lock()
+    
+    def get_authorization_url(self, state: str = "random_state") -> str:
+        """Generate LinkedIn OAuth authorization URL with minimal scopes"""
+        return f"{self.auth_url}?{self._auth_query}&state={urllib.parse.quote_plus(state)}"
     
     def exchange_code_for_token(self, code: str) -> Optional[Dict]:
         """Exchange authorization code for access token"""
         data = {
             "grant_type": "authorization_code",
             "code": code,
-            "redirect_uri": "http://localhost:8502/linkedin/callback",
+            "redirect_uri": self.REDIRECT_URI,
             "client_id": settings.LINKEDIN_CLIENT_ID,
             "client_secret": settings.LINKEDIN_CLIENT_SECRET
         }
         
-        headers = {
-            "Content-Type": "application/x-www-form-urlencoded"
-        }
-        
         try:
-            response = requests.post(self.token_url, data=data, headers=headers)
-            response.raise_for_status()
-            token_data = response.json()
+            response = self.session.post(self.token_url, data=data, headers=self._TOKEN_HEADERS,
+                                         timeout=REQUEST_TIMEOUT)
+            if not response.ok:
+                # Keep LinkedIn's error body, which says why the code was rejected
+                logger.error(f"Failed to exchange code for token: {response.status_code} - {response.text}")
+                return None
+            token_data = orjson.loads(response.content)
             
             # Get user profile immediately after token exchange
             profile = self.get_user_profile(token_data['access_token'])
@@ -62,13 +102,14 @@ class LinkedInService:
         
         try:
             # Try OpenID Connect userinfo endpoint first
-            userinfo_response = requests.get(
-                "https://api.linkedin.com/v2/userinfo",
-                headers=headers
+            userinfo_response = self.session.get(
+                self._USERINFO_URL,
+                headers=headers,
+                timeout=REQUEST_TIMEOUT
             )
             
             if userinfo_response.status_code == 200:
-                userinfo_data = userinfo_response.json()
+                userinfo_data = orjson.loads(userinfo_response.content)
                 
                 result = {
                     "id": userinfo_data.get("sub"),  # OpenID Connect subject
@@ -79,16 +120,18 @@ class LinkedInService:
                     "picture": userinfo_data.get("picture", "")
                 }
                 
+                self._remember_user_id(access_token, result["id"])
                 return result
             
             # Fallback to basic profile endpoint
-            profile_response = requests.get(
-                f"{self.base_url}/people/~:(id,firstName,lastName)",
-                headers=headers
+            profile_response = self.session.get(
+                self._LEGACY_PROFILE_URL,
+                headers=headers,
+                timeout=REQUEST_TIMEOUT
             )
             
             if profile_response.status_code == 200:
-                profile_data = profile_response.json()
+                profile_data = orjson.loads(profile_response.content)
                 
                 result = {
                     "id": profile_data.get("id"),
@@ -101,6 +144,7 @@ class LinkedInService:
                 
                 result["fullName"] = f"{result['firstName']} {result['lastName']}".strip()
                 
+                self._remember_user_id(access_token, result["id"])
                 return result
             
             return None
@@ -109,16 +153,13 @@ class LinkedInService:
             logger.error(f"Error getting user profile: {e}")
             return None
     
-    def publish_post(self, access_token: str, content: str, hashtags: List[str] = None) -> Optional[str]:
-        """Publish a post to LinkedIn"""
-        headers = {
-            "Authorization": f"Bearer {access_token}",
-            "Content-Type": "application/json",
-            "X-Restli-Protocol-Version": "2.0.0"
-        }
+    def publish_post(self, access_token: str, content: str, hashtags: List[str] = None,
+                     user_id: Optional[str] = None) -> Optional[str]:
+        """Publish a post to LinkedIn; pass user_id when the caller already knows it"""
+        headers = {**self._PUBLISH_HEADERS, "Authorization": f"Bearer {access_token}"}
         
-        # Get user ID first
-        user_id = self._get_user_id(access_token)
+        # Get user ID first (cached per token, so usually no extra round-trip)
+        user_id = user_id or self._get_user_id(access_token)
         if not user_id:
             logger.error("Could not get user ID")
             return None
@@ -126,8 +167,7 @@ class LinkedInService:
         # Prepare content with hashtags
         post_content = content
         if hashtags:
-            hashtag_text = "\n\n" + " ".join([f"#{tag}" for tag in hashtags])
-            post_content += hashtag_text
+            post_content += _render_hashtags(tuple(hashtags))
         
         # Prepare post data
         post_data = {
@@ -147,14 +187,16 @@ class LinkedInService:
         }
         
         try:
-            response = requests.post(
-                f"{self.base_url}/ugcPosts",
+            response = self.session.post(
+                self._UGC_URL,
                 headers=headers,
-                json=post_data
+                # Pre-encoded with orjson; the Content-Type header is already set above
+                data=orjson.dumps(post_data),
+                timeout=REQUEST_TIMEOUT
             )
             
             if response.status_code == 201:
-                result = response.json()
+                result = orjson.loads(response.content)
                 return result.get("id")
             else:
                 logger.error(f"Failed to publish post: {response.status_code} - {response.text}")
@@ -164,8 +206,30 @@ class LinkedInService:
             logger.error(f"Error publishing post: {e}")
             return None
     
+    @staticmethod
+    def _token_key(access_token: str) -> str:
+        return hashlib.sha256(access_token.encode()).hexdigest()[:16]
+    
+    def _remember_user_id(self, access_token: str, user_id: Optional[str]):
+        if not user_id:
+            return
+        with self._uid_lock:
+            if len(self._uid_cache) >= USER_ID_CACHE_MAX:
+                now = time.monotonic()
+                self._uid_cache = {k: v for k, v in self._uid_cache.items() if v[0] > now}
+                if len(self._uid_cache) >= USER_ID_CACHE_MAX:
+                    self._uid_cache.pop(next(iter(self._uid_cache)))
+            self._uid_cache[self._token_key(access_token)] = (time.monotonic() + USER_ID_TTL, user_id)
+    
     def _get_user_id(self, access_token: str) -> Optional[str]:
         """Get user ID from access token"""
+        key = self._token_key(access_token)
+        with self._uid_lock:
+            entry = self._uid_cache.get(key)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+        
+        # get_user_profile populates the cache on success
         profile = self.get_user_profile(access_token)
         return profile.get("id") if profile else None
     
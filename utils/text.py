@@ -0,0 +1,5 @@
+def preview(text: str, limit: int = 200) -> str:
+    """Shorten text to `limit` characters, appending an ellipsis only when cut"""
+    if len(text) <= limit:
+        return text
+    return text[:limit] + "..."